@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from cache import TTLCache
+from postgres_api import get_cached_analysis, store_cached_analysis
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever create_analysis_prompt changes, so results of the old prompt stop matching
+ANALYSIS_PROMPT_VERSION = 2
+
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "86400"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
+ANALYSIS_CACHE_PERSIST = os.getenv("ANALYSIS_CACHE_PERSIST", "true").lower() == "true"
+
+def normalize_code(code: str) -> str:
+    # Line endings and trailing whitespace don't change the analysis
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+def analysis_cache_key(code: str, language: str, context: str, model: str,
+                       prompt_version: int = ANALYSIS_PROMPT_VERSION) -> str:
+    payload = json.dumps([normalize_code(code), language.lower(), context.strip(), model, prompt_version])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class AnalysisCache:
+    """
+        Analysis results keyed by a hash of (normalized code, language, context,
+        model name, prompt version).
+
+        Lookups go to an in-memory TTL cache first, then to the `analysis_cache`
+        table so results survive restarts and are shared across workers. Database
+        errors are logged and treated as misses; the cache never fails an analysis.
+    """
+
+    def __init__(self, ttl: float = ANALYSIS_CACHE_TTL, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES,
+                 persist: bool = ANALYSIS_CACHE_PERSIST):
+        self.memory = TTLCache(maxsize=max_entries, ttl=ttl)
+        self.persist = persist
+        self.db_hits = 0
+        self.db_errors = 0
+
+    async def get(self, key: str):
+        result = self.memory.get(key)
+        if result is not None or not self.persist:
+            return result
+
+        try:
+            result = await asyncio.to_thread(get_cached_analysis, key)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("lookup failed: %s", e)
+            return None
+
+        if result is not None:
+            self.db_hits += 1
+            logger.debug("database hit for %s", key[:12])
+            self.memory.set(key, result)
+        return result
+
+    async def set(self, key: str, original_code: str, result: dict, analysis_type: str = "general"):
+        self.memory.set(key, result)
+        if not self.persist:
+            return
+
+        try:
+            await asyncio.to_thread(store_cached_analysis, key, original_code, result, analysis_type)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("store failed: %s", e)
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "db_hits": self.db_hits, "db_errors": self.db_errors}
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Compares /api/db/search/code's full-text query with the ILIKE scan it replaced,
+on a synthetic corpus of code_projects.
+
+    python bench_code_search.py --seed 100000      # once; projects are tagged 'bench-search'
+    python bench_code_search.py
+    python bench_code_search.py --cleanup          # delete the synthetic projects
+
+Both queries run against the database directly, so the numbers are query time
+without HTTP. Run POST /api/db/init first so the search column and indexes exist.
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from psycopg2.extras import execute_values
+
+from postgres_api import get_db_connection, search_code_projects
+
+TAG = "bench-search"
+LANGUAGES = ["python", "javascript", "typescript", "go", "rust", "java", "cpp", "ruby"]
+VERBS = ["get", "set", "load", "save", "parse", "render", "fetch", "build", "merge", "split",
+         "sort", "filter", "index", "cache", "stream", "retry", "encode", "decode", "validate", "paginate"]
+NOUNS = ["user", "order", "item", "token", "session", "config", "report", "invoice", "message", "page",
+         "buffer", "record", "schema", "query", "result", "event", "metric", "account", "file", "chunk"]
+
+# (query, language) pairs; selective and broad terms, with and without a language filter
+QUERIES = [
+    ("paginate_invoice", None),
+    ("retry session", None),
+    ("decode", None),
+    ("validate schema", "python"),
+    ("merge chunk", "go"),
+    ("stream", "rust"),
+]
+
+LEGACY_SQL = """
+    SELECT * FROM code_projects
+    WHERE (code_content ILIKE %s OR name ILIKE %s OR description ILIKE %s)
+    {language}
+    ORDER BY updated_at DESC
+    LIMIT 20
+"""
+
+def synthetic_project(rng: random.Random) -> tuple:
+    functions = []
+    for _ in range(rng.randint(3, 12)):
+        verb, noun, other = rng.choice(VERBS), rng.choice(NOUNS), rng.choice(NOUNS)
+        functions.append(
+            f"def {verb}_{noun}({noun}, {other}=None):\n"
+            f"    # {verb} the {noun} and return its {other}\n"
+            f"    return {noun}.{other} if {other} else {noun}\n"
+        )
+    name = f"{rng.choice(NOUNS)}-{rng.choice(VERBS)}-{rng.randrange(10_000)}"
+    return (str(uuid.uuid4()), name, f"{TAG} {rng.choice(VERBS)} {rng.choice(NOUNS)} helpers",
+            rng.choice(LANGUAGES), "\n".join(functions))
+
+def seed(count: int, batch_size: int = 2000):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            for offset in range(0, count, batch_size):
+                rows = [synthetic_project(rng) for _ in range(min(batch_size, count - offset))]
+                execute_values(cursor, """
+                    INSERT INTO code_projects (id, name, description, language, code_content)
+                    VALUES %s
+                """, rows)
+            cursor.execute("ANALYZE code_projects")
+        conn.commit()
+    print(f"seeded {count} projects in {time.perf_counter() - start:.1f}s")
+
+def cleanup():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM code_projects WHERE description LIKE %s", (f"{TAG} %",))
+            print(f"deleted {cursor.rowcount} projects")
+        conn.commit()
+
+def legacy_search(query: str, language: str = None) -> list:
+    pattern = f"%{query}%"
+    params = [pattern, pattern, pattern]
+    if language:
+        params.append(language)
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(LEGACY_SQL.format(language="AND language = %s" if language else ""), params)
+            return cursor.fetchall()
+
+def timed(function, *args, repeat: int) -> tuple:
+    latencies, results = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = function(*args)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), len(results)
+
+def run(repeat: int):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM code_projects")
+            total = cursor.fetchone()[0]
+
+    print(f"Code search benchmark ({total} projects, median of {repeat} runs)")
+    print("=" * 78)
+    print(f"{'query':<20} {'language':<9} {'ILIKE ms':>10} {'rows':>5} {'full-text ms':>13} {'rows':>5} {'speedup':>9}")
+    for query, language in QUERIES:
+        legacy_ms, legacy_rows = timed(legacy_search, query, language, repeat=repeat)
+        fts_ms, fts_rows = timed(search_code_projects, query, language, repeat=repeat)
+        print(f"{query:<20} {language or '-':<9} {legacy_ms * 1000:>10.1f} {legacy_rows:>5} "
+              f"{fts_ms * 1000:>13.1f} {fts_rows:>5} {legacy_ms / fts_ms:>8.1f}x")
+    print("=" * 78)
+    print("ILIKE matches substrings and returns the newest rows; full-text matches token")
+    print("prefixes and returns the best ranked ones, so row sets can differ.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text code search vs the old ILIKE scan")
+    parser.add_argument("--seed", type=int, default=0, help="insert this many synthetic projects first")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cleanup", action="store_true", help="delete the synthetic projects and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        if args.seed:
+            seed(args.seed)
+        run(args.repeat)
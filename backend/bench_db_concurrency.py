@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Measures how /api/db throughput scales with the number of requests in flight.
+With blocking handlers on the event loop every level gets the throughput of
+level 1 and /health waits behind the queries; with the handlers in the
+threadpool throughput grows until the connection pool or postgres saturates
+(on a single-core box running postgres too, only the /health column moves).
+
+    uvicorn main:app --port 8000
+    python bench_db_concurrency.py --seed 20000        # once, fills code_projects
+    python bench_db_concurrency.py --levels 1,2,4,8,16
+
+The default request is an ILIKE search over code_projects, which scans the
+table and so stands in for a slow query.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+
+LANGUAGES = ["python", "javascript", "typescript", "go", "rust", "java"]
+WORDS = ["parse", "fetch", "cache", "render", "index", "merge", "stream", "retry", "batch", "token"]
+
+def seed_projects(count: int, batch_size: int = 1000):
+    """Inserts `count` synthetic projects straight through the connection pool"""
+    from psycopg2.extras import execute_values
+    from postgres_api import get_db_connection
+
+    rng = random.Random(0)
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            for start in range(0, count, batch_size):
+                rows = []
+                for i in range(start, min(start + batch_size, count)):
+                    words = rng.sample(WORDS, 3)
+                    body = "\n".join(f"def {w}_{i}_{n}(data):\n    return data  # {' '.join(words)}" for n, w in enumerate(words))
+                    rows.append((str(uuid.uuid4()), f"{words[0]}-{i}", f"synthetic {' '.join(words)}",
+                                 rng.choice(LANGUAGES), body * 20))
+                execute_values(cursor, """
+                    INSERT INTO code_projects (id, name, description, language, code_content)
+                    VALUES %s
+                """, rows)
+        conn.commit()
+    print(f"seeded {count} projects")
+
+async def timed_get(client: httpx.AsyncClient, path: str, params: dict = None) -> tuple:
+    start = time.perf_counter()
+    try:
+        response = await client.get(path, params=params)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - start
+
+async def run_level(client: httpx.AsyncClient, path: str, params: dict, concurrency: int, total: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async def one():
+        async with semaphore:
+            return await timed_get(client, path, params)
+
+    async def probe_health():
+        latencies = []
+        while not done.is_set():
+            _, latency = await timed_get(client, "/health")
+            latencies.append(latency)
+            await asyncio.sleep(0.05)
+        return latencies
+
+    probe = asyncio.create_task(probe_health())
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(total)))
+    wall = time.perf_counter() - start
+    done.set()
+    health = await probe
+
+    latencies = sorted(latency for _, latency in results)
+    return {
+        "concurrency": concurrency,
+        "errors": sum(status != 200 for status, _ in results),
+        "throughput": total / wall,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "health_max": max(health) if health else 0.0
+    }
+
+async def run(url: str, levels: list, total: int, query: str, timeout: float) -> list:
+    limits = httpx.Limits(max_connections=max(levels) + 1)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        # Warm up the pool and the table cache so level 1 isn't charged for it
+        await timed_get(client, "/api/db/search/code", {"query": query})
+        return [await run_level(client, "/api/db/search/code", {"query": query}, level, total) for level in levels]
+
+def report(results: list):
+    print("DB concurrency benchmark (/api/db/search/code)")
+    print("=" * 72)
+    print(f"{'in flight':>9} {'req/s':>9} {'scaling':>8} {'p50 ms':>9} {'p95 ms':>9} {'/health max ms':>15} {'errors':>6}")
+    base = results[0]["throughput"]
+    for r in results:
+        print(f"{r['concurrency']:>9} {r['throughput']:>9.1f} {r['throughput'] / base:>7.2f}x "
+              f"{r['p50'] * 1000:>9.1f} {r['p95'] * 1000:>9.1f} {r['health_max'] * 1000:>15.1f} {r['errors']:>6}")
+    print("=" * 72)
+    print("scaling 1.00x at every level means the requests are serialized")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of /api/db as requests in flight grow")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma separated numbers of requests in flight")
+    parser.add_argument("--requests", type=int, default=64, help="requests per level")
+    parser.add_argument("--query", default="retry", help="search term sent to /api/db/search/code")
+    parser.add_argument("--seed", type=int, default=0, help="insert this many synthetic projects first")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_projects(args.seed)
+
+    levels = [int(level) for level in args.levels.split(",")]
+    report(asyncio.run(run(args.url, levels, args.requests, args.query, args.timeout)))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Measures how many lib_extractor_llm calls the local detector avoids.
+
+    python bench_lib_detector.py                 # local detection only
+    python bench_lib_detector.py --compare       # also run the LLM and compare libraries
+    python bench_lib_detector.py --prompts prompts.json
+
+`--prompts` takes a JSON list of recorded queries, in the same
+"code:\\n...\\n\\nprompt:\\n..." layout the frontend sends.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from lib_detector import detect_libs, LIB_DETECTOR_MIN_CONFIDENCE
+
+RECORDED_PROMPTS = [
+    "code:\nimport pandas as pd\ndf = pd.read_csv('sales.csv')\nprint(df.groupby('region').sum())\n\nprompt:\nmake this faster on a 5GB file",
+    "code:\nfrom fastapi import FastAPI\napp = FastAPI()\n\n@app.get('/items')\ndef items():\n    return []\n\nprompt:\nadd pagination to this endpoint",
+    "code:\nimport numpy as np\na = np.zeros((3, 3))\nprint(a @ a.T)\n\nprompt:\nwhy is the result all zeros",
+    "code:\nimport matplotlib.pyplot as plt\nplt.plot([1, 2, 3])\n\nprompt:\nadd axis labels and a legend",
+    "code:\nimport requests\nr = requests.get(url)\n\nprompt:\nadd retries and a timeout",
+    "code:\nfrom pydantic import BaseModel\nclass User(BaseModel):\n    name: str\n\nprompt:\nvalidate that the name is not empty",
+    "code:\nfrom flask import Flask\napp = Flask(__name__)\n\nprompt:\nserve static files",
+    "code:\nfrom django.db import models\nclass Post(models.Model):\n    title = models.CharField(max_length=100)\n\nprompt:\nadd a created_at field",
+    "code:\nfrom project_demo import Client\nclient = Client()\nclient.create_task('x')\n\nprompt:\nhow do I list tasks",
+    "code:\nfunction bubbleSort(arr) {\n  return arr.sort();\n}\n\nprompt:\nexplain the complexity",
+    "how do I paginate results with fastapi",
+    "fastapi pagination example",
+    "convert a pandas dataframe to a numpy array",
+    "how do I build a langchain agent with tools",
+    "np.linspace vs np.arange",
+    "scrape product prices from a website",
+    "write a function that reverses a linked list",
+    "plot a histogram of response times",
+    "what is the difference between a list and a tuple",
+    "code:\nx = [i * 2 for i in range(10)]\n\nprompt:\nmake this a generator",
+]
+
+async def compare_with_llm(prompts: list) -> list:
+    from main import lib_extractor_llm
+
+    results = []
+    for prompt in prompts:
+        llm_libs = await lib_extractor_llm.ainvoke(prompt)
+        results.append(set(llm_libs.to_dict_public()) | set(llm_libs.to_dict_private()))
+    return results
+
+def run(prompts: list, min_confidence: float, compare: bool):
+    start = time.perf_counter()
+    detections = [detect_libs(prompt) for prompt in prompts]
+    elapsed = time.perf_counter() - start
+
+    local = [libs.lib and confidence >= min_confidence for libs, confidence in detections]
+
+    print("Local library detection")
+    print("=" * 50)
+    for prompt, (libs, confidence), used in zip(prompts, detections, local):
+        first_line = prompt.replace("\n", " ")[:60]
+        print(f"{'local' if used else 'LLM  '} {confidence:4.2f} {first_line:<60} {[item.split(':')[0] for item in libs.lib]}")
+
+    avoided = sum(bool(used) for used in local)
+    print("=" * 50)
+    print(f"prompts:            {len(prompts)}")
+    print(f"LLM calls avoided:  {avoided} ({avoided / len(prompts):.0%})")
+    print(f"detection time:     {elapsed / len(prompts) * 1000:.3f}ms per prompt")
+
+    if compare:
+        llm_results = asyncio.run(compare_with_llm(prompts))
+        agree = [
+            set(item.split(":")[0] for item in libs.lib) == llm_libs
+            for (libs, _), llm_libs, used in zip(detections, llm_results, local) if used
+        ]
+        if agree:
+            print(f"agreement with LLM: {sum(agree)}/{len(agree)} locally answered prompts")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM calls avoided by the local library detector")
+    parser.add_argument("--prompts", help="JSON file with a list of recorded queries")
+    parser.add_argument("--min-confidence", type=float, default=LIB_DETECTOR_MIN_CONFIDENCE)
+    parser.add_argument("--compare", action="store_true", help="run lib_extractor_llm on every prompt and compare")
+    args = parser.parse_args()
+
+    prompts = RECORDED_PROMPTS
+    if args.prompts:
+        with open(args.prompts) as f:
+            prompts = json.load(f)
+
+    run(prompts, args.min_confidence, args.compare)
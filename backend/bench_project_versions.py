@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Storage and rebuild time of project versioning on synthetic edit histories.
+
+    python bench_project_versions.py
+    python bench_project_versions.py --lines 3000 --revisions 500 --intervals 10,20,50
+
+Each history starts from a generated Python module and applies a few edits per
+revision: changed lines, inserted and deleted functions, and now and then a
+rename that touches every use of an identifier. It is stored three ways: full
+copies, zlib-compressed full copies, and snapshots plus deltas through
+code_delta.encode_revision, the same path update_code_project uses.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from code_delta import encode_revision, rebuild
+
+NAMES = ["user", "order", "item", "token", "session", "config", "report", "invoice", "message", "page"]
+
+def function_block(rng: random.Random, index: int) -> list:
+    name, other = rng.choice(NAMES), rng.choice(NAMES)
+    body = [f"    {other}_{n} = {name}.get('{other}', {n})\n" for n in range(rng.randint(2, 10))]
+    return [f"def handle_{name}_{index}({name}, {other}=None):\n",
+            f"    \"\"\"Handles the {name} of a {other}\"\"\"\n",
+            *body,
+            f"    return {name}\n",
+            "\n"]
+
+def initial_module(rng: random.Random, lines: int) -> list:
+    module, index = ["import json\n", "import os\n", "\n"], 0
+    while len(module) < lines:
+        module.extend(function_block(rng, index))
+        index += 1
+    return module
+
+def edit(rng: random.Random, lines: list, revision: int) -> list:
+    lines = list(lines)
+    for _ in range(rng.randint(1, 3)):
+        action = rng.random()
+        position = rng.randrange(len(lines))
+        if action < 0.6:
+            lines[position] = f"    value = compute({revision}, {rng.randrange(1000)})\n"
+        elif action < 0.8:
+            lines[position:position] = function_block(rng, 10_000 + revision)
+        elif action < 0.95:
+            del lines[position:position + rng.randint(1, 12)]
+        else:
+            old, new = rng.choice(NAMES), f"{rng.choice(NAMES)}_v{revision}"
+            lines = [line.replace(old, new) for line in lines]
+    return lines
+
+def history(lines: int, revisions: int, seed: int) -> list:
+    rng = random.Random(seed)
+    current = initial_module(rng, lines)
+    texts = ["".join(current)]
+    for revision in range(1, revisions):
+        current = edit(rng, current, revision)
+        texts.append("".join(current))
+    return texts
+
+def store(texts: list, interval: int) -> tuple:
+    """Returns ([(kind, data)], seconds spent encoding) as record_project_version would store them"""
+    stored, since_snapshot, previous = [], None, None
+    start = time.perf_counter()
+    for text in texts:
+        kind, data = encode_revision(previous, text, since_snapshot, interval)
+        stored.append((kind, data))
+        since_snapshot = 1 if kind == "snapshot" else since_snapshot + 1
+        previous = text
+    return stored, time.perf_counter() - start
+
+def rebuild_version(stored: list, version: int) -> tuple:
+    first = max(i for i in range(version + 1) if stored[i][0] == "snapshot")
+    return rebuild(stored[first][1], [data for _, data in stored[first + 1:version + 1]]), version - first
+
+def run(lines: int, revisions: int, intervals: list, seed: int):
+    texts = history(lines, revisions, seed)
+    raw = sum(len(text.encode()) for text in texts)
+    compressed = sum(len(data) for _, data in store(texts, 1)[0])
+
+    print(f"Project versioning: {revisions} revisions, {len(texts[0].splitlines())} -> {len(texts[-1].splitlines())} lines")
+    print("=" * 86)
+    print(f"{'storage':<24} {'bytes':>12} {'vs full':>8} {'snapshots':>10} {'write ms/rev':>13} {'rebuild ms avg/max':>18}")
+    print(f"{'full copies':<24} {raw:>12,} {1:>7.2f}x {revisions:>10} {'-':>13} {'-':>18}")
+    print(f"{'zlib full copies':<24} {compressed:>12,} {compressed / raw:>7.3f}x {revisions:>10} {'-':>13} {'-':>18}")
+
+    for interval in intervals:
+        stored, encode_seconds = store(texts, interval)
+        total = sum(len(data) for _, data in stored)
+        snapshots = sum(kind == "snapshot" for kind, _ in stored)
+
+        timings, worst_chain = [], 0
+        for version, text in enumerate(texts):
+            start = time.perf_counter()
+            rebuilt, chain = rebuild_version(stored, version)
+            timings.append(time.perf_counter() - start)
+            worst_chain = max(worst_chain, chain)
+            assert rebuilt == text, f"version {version} did not round-trip"
+
+        label = f"deltas, interval {interval}"
+        print(f"{label:<24} {total:>12,} {total / raw:>7.3f}x {snapshots:>10} "
+              f"{encode_seconds / revisions * 1000:>13.2f} "
+              f"{statistics.mean(timings) * 1000:>8.2f} / {max(timings) * 1000:>6.2f}")
+        print(f"{'':<24} longest chain {worst_chain} deltas")
+    print("=" * 86)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Storage and rebuild time of delta-based project versions")
+    parser.add_argument("--lines", type=int, default=2000, help="lines in the initial module")
+    parser.add_argument("--revisions", type=int, default=300)
+    parser.add_argument("--intervals", default="5,20,50", help="comma separated snapshot intervals")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.lines, args.revisions, [int(interval) for interval in args.intervals.split(",")], args.seed)
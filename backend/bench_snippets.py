@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Compares snippet retrieval latency of the in-process index with Pinecone.
+
+    # local search on a synthetic namespace, no keys needed
+    python bench_snippets.py --synthetic 500 --dim 1024
+
+    # local vs remote on an exported namespace (python local_index.py project_demo)
+    python bench_snippets.py --namespace project_demo --remote
+
+Local timings are reported with and without query embedding, since the
+embedding call is the only network hop left on the local path (and is cached
+for repeated topics).
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from local_index import LocalSnippetIndex
+
+TOPICS = [
+    "create a project and add tasks",
+    "authenticate a client with an api key",
+    "paginate through search results",
+    "handle errors raised by the client",
+    "configure logging for the service",
+    "upload a file and track progress",
+    "run background jobs on a schedule",
+    "export data to csv",
+]
+
+def percentiles(samples: list) -> str:
+    ms = np.asarray(samples) * 1000
+    return f"p50={np.percentile(ms, 50):8.3f}ms  p99={np.percentile(ms, 99):8.3f}ms  n={len(ms)}"
+
+def timed(fn, repeats: int) -> list:
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_synthetic(size: int, dim: int, repeats: int, top_k: int):
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        index = LocalSnippetIndex(directory)
+        records = [{"_id": str(i), "fields": {"TITLE": f"snippet {i}"}} for i in range(size)]
+        index.build_namespace("synthetic", records, rng.standard_normal((size, dim)))
+
+        queries = rng.standard_normal((repeats, dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        samples = timed(lambda i: index.search_vector("synthetic", queries[i], top_k), repeats)
+        print(f"local search ({size} x {dim}):   {percentiles(samples)}")
+
+def bench_namespace(namespace: str, repeats: int, top_k: int, remote: bool):
+    index = LocalSnippetIndex()
+    topic = lambda i: TOPICS[i % len(TOPICS)]
+
+    vectors = {t: index.embed(t) for t in TOPICS}
+    samples = timed(lambda i: index.search_vector(namespace, vectors[topic(i)], top_k), repeats)
+    print(f"local search only:           {percentiles(samples)}")
+
+    index.query_cache.clear()
+    samples = timed(lambda i: index.search(namespace, topic(i), top_k), repeats)
+    print(f"local embed + search:        {percentiles(samples)}")
+
+    if remote:
+        from llm_tools import _remote_hits
+
+        samples = timed(lambda i: _remote_hits(namespace, topic(i), top_k), repeats)
+        print(f"remote (Pinecone) search:    {percentiles(samples)}")
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Local vs remote snippet retrieval latency")
+    parser.add_argument("--synthetic", type=int, help="benchmark a random namespace of this many snippets")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--namespace", default="project_demo")
+    parser.add_argument("--remote", action="store_true", help="also time the Pinecone path")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    print("Snippet retrieval latency")
+    print("=" * 50)
+    if args.synthetic:
+        bench_synthetic(args.synthetic, args.dim, args.repeats, args.top_k)
+    else:
+        bench_namespace(args.namespace, args.repeats, args.top_k, args.remote)
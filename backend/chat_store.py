@@ -0,0 +1,315 @@
+import asyncio
+import bisect
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from models.api_models import Chat, ChatMessage
+from postgres_api import get_db_connection
+
+CHAT_STORE = os.getenv("CHAT_STORE", "memory")
+
+class ChatStore(ABC):
+    """
+        Storage interface for chats and their messages.
+
+        Messages of a chat are returned in timestamp order; `limit`/`offset` page
+        through that order. Methods are coroutines so stores doing blocking I/O
+        can run it off the event loop.
+    """
+
+    async def add_chat(self, chat: Chat) -> Chat:
+        return (await self.add_chats([chat]))[0]
+
+    @abstractmethod
+    async def add_chats(self, chats: List[Chat]) -> List[Chat]:
+        ...
+
+    @abstractmethod
+    async def get_chat(self, chat_id: str) -> Optional[Chat]:
+        ...
+
+    @abstractmethod
+    async def list_chats(self) -> List[Chat]:
+        ...
+
+    async def has_chat(self, chat_id: str) -> bool:
+        return await self.get_chat(chat_id) is not None
+
+    @abstractmethod
+    async def update_chat(self, chat_id: str, **fields) -> Optional[Chat]:
+        ...
+
+    @abstractmethod
+    async def delete_chat(self, chat_id: str) -> bool:
+        ...
+
+    async def add_message(self, message: ChatMessage) -> ChatMessage:
+        return (await self.add_messages([message]))[0]
+
+    @abstractmethod
+    async def add_messages(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        ...
+
+    @abstractmethod
+    async def save_batch(self, chats: List[Chat], messages: List[ChatMessage]) -> None:
+        """
+            Writes a batch of chats and messages together. Chats are upserted: one
+            that already exists keeps its `created_at` and takes the new title and
+            `updated_at`.
+        """
+
+    @abstractmethod
+    async def get_message(self, message_id: str) -> Optional[ChatMessage]:
+        ...
+
+    @abstractmethod
+    async def get_messages(self, chat_id: str, limit: Optional[int] = None, offset: int = 0) -> List[ChatMessage]:
+        ...
+
+class InMemoryChatStore(ChatStore):
+    """
+        Chat store held in process memory.
+
+        Every chat keeps its own message list in timestamp order (plus a parallel
+        list of timestamps for bisect), so reading a chat costs O(messages in that
+        chat), deleting it costs O(k) and pages are slices of an already sorted list.
+    """
+
+    def __init__(self):
+        self._chats = {}
+        self._messages = {}
+        self._chat_messages = {}
+        self._chat_timestamps = {}
+
+    async def add_chats(self, chats: List[Chat]) -> List[Chat]:
+        for chat in chats:
+            self._chats[chat.id] = chat
+            self._chat_messages.setdefault(chat.id, [])
+            self._chat_timestamps.setdefault(chat.id, [])
+        return chats
+
+    async def get_chat(self, chat_id: str) -> Optional[Chat]:
+        return self._chats.get(chat_id)
+
+    async def list_chats(self) -> List[Chat]:
+        return list(self._chats.values())
+
+    async def has_chat(self, chat_id: str) -> bool:
+        return chat_id in self._chats
+
+    async def update_chat(self, chat_id: str, **fields) -> Optional[Chat]:
+        chat = self._chats.get(chat_id)
+        if chat is not None:
+            for name, value in fields.items():
+                setattr(chat, name, value)
+        return chat
+
+    async def delete_chat(self, chat_id: str) -> bool:
+        if self._chats.pop(chat_id, None) is None:
+            return False
+        for message in self._chat_messages.pop(chat_id, []):
+            self._messages.pop(message.id, None)
+        self._chat_timestamps.pop(chat_id, None)
+        return True
+
+    async def add_messages(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        for message in messages:
+            self._messages[message.id] = message
+            chat_messages = self._chat_messages.setdefault(message.chat_id, [])
+            timestamps = self._chat_timestamps.setdefault(message.chat_id, [])
+
+            # Messages almost always arrive in order, so this is an append
+            position = bisect.bisect_right(timestamps, message.timestamp)
+            timestamps.insert(position, message.timestamp)
+            chat_messages.insert(position, message)
+        return messages
+
+    async def save_batch(self, chats: List[Chat], messages: List[ChatMessage]) -> None:
+        for chat in chats:
+            existing = self._chats.get(chat.id)
+            if existing is None:
+                await self.add_chats([chat])
+            else:
+                existing.title, existing.updated_at = chat.title, chat.updated_at
+        await self.add_messages(messages)
+
+    async def get_message(self, message_id: str) -> Optional[ChatMessage]:
+        return self._messages.get(message_id)
+
+    async def get_messages(self, chat_id: str, limit: Optional[int] = None, offset: int = 0) -> List[ChatMessage]:
+        chat_messages = self._chat_messages.get(chat_id, [])
+        end = None if limit is None else offset + limit
+        return chat_messages[offset:end]
+
+class PostgresChatStore(ChatStore):
+    """
+        Chat store backed by the `chats` and `chat_messages` tables of postgres_api.
+
+        psycopg2 is blocking, so every method runs its queries in a worker thread.
+    """
+
+    async def add_chats(self, chats: List[Chat]) -> List[Chat]:
+        return await asyncio.to_thread(self._add_chats, chats)
+
+    async def get_chat(self, chat_id: str) -> Optional[Chat]:
+        return await asyncio.to_thread(self._get_chat, chat_id)
+
+    async def list_chats(self) -> List[Chat]:
+        return await asyncio.to_thread(self._list_chats)
+
+    async def update_chat(self, chat_id: str, **fields) -> Optional[Chat]:
+        return await asyncio.to_thread(self._update_chat, chat_id, fields)
+
+    async def delete_chat(self, chat_id: str) -> bool:
+        return await asyncio.to_thread(self._delete_chat, chat_id)
+
+    async def add_messages(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        return await asyncio.to_thread(self._add_messages, messages)
+
+    async def save_batch(self, chats: List[Chat], messages: List[ChatMessage]) -> None:
+        await asyncio.to_thread(self._save_batch, chats, messages)
+
+    async def get_message(self, message_id: str) -> Optional[ChatMessage]:
+        return await asyncio.to_thread(self._get_message, message_id)
+
+    async def get_messages(self, chat_id: str, limit: Optional[int] = None, offset: int = 0) -> List[ChatMessage]:
+        return await asyncio.to_thread(self._get_messages, chat_id, limit, offset)
+
+    def _add_chats(self, chats: List[Chat]) -> List[Chat]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                self._insert_chats(cursor, chats)
+                conn.commit()
+        return chats
+
+    def _get_chat(self, chat_id: str) -> Optional[Chat]:
+        if not self._is_uuid(chat_id):
+            return None
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("SELECT id, title, created_at, updated_at FROM chats WHERE id = %s", (chat_id,))
+                row = cursor.fetchone()
+        return Chat(**self._chat_row(row)) if row else None
+
+    def _list_chats(self) -> List[Chat]:
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("SELECT id, title, created_at, updated_at FROM chats ORDER BY updated_at DESC")
+                rows = cursor.fetchall()
+        return [Chat(**self._chat_row(row)) for row in rows]
+
+    def _update_chat(self, chat_id: str, fields: dict) -> Optional[Chat]:
+        columns = [name for name in fields if name in ("title", "updated_at")]
+        if not columns or not self._is_uuid(chat_id):
+            return self._get_chat(chat_id)
+
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    f"UPDATE chats SET {', '.join(f'{name} = %s' for name in columns)} WHERE id = %s "
+                    "RETURNING id, title, created_at, updated_at",
+                    [fields[name] for name in columns] + [chat_id]
+                )
+                row = cursor.fetchone()
+                conn.commit()
+        return Chat(**self._chat_row(row)) if row else None
+
+    def _delete_chat(self, chat_id: str) -> bool:
+        if not self._is_uuid(chat_id):
+            return False
+        # chat_messages rows go with it through ON DELETE CASCADE
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM chats WHERE id = %s", (chat_id,))
+                deleted = cursor.rowcount > 0
+                conn.commit()
+        return deleted
+
+    def _add_messages(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                self._insert_messages(cursor, messages)
+                conn.commit()
+        return messages
+
+    def _save_batch(self, chats: List[Chat], messages: List[ChatMessage]):
+        # One transaction: a failure rolls back when the pool takes the connection back
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                self._insert_chats(cursor, chats, upsert=True)
+                self._insert_messages(cursor, messages)
+            conn.commit()
+
+    @staticmethod
+    def _insert_chats(cursor, chats: List[Chat], upsert: bool = False):
+        if not chats:
+            return
+        conflict = "ON CONFLICT (id) DO UPDATE SET title = EXCLUDED.title, updated_at = EXCLUDED.updated_at" if upsert else ""
+        execute_values(cursor, f"""
+            INSERT INTO chats (id, title, created_at, updated_at)
+            VALUES %s
+            {conflict}
+        """, [(chat.id, chat.title, chat.created_at, chat.updated_at) for chat in chats])
+
+    @staticmethod
+    def _insert_messages(cursor, messages: List[ChatMessage]):
+        if not messages:
+            return
+        execute_values(cursor, """
+            INSERT INTO chat_messages (id, chat_id, content, is_user, timestamp, metadata)
+            VALUES %s
+        """, [
+            (message.id, message.chat_id, message.content, message.is_user, message.timestamp,
+             json.dumps(message.metadata) if message.metadata else None)
+            for message in messages
+        ])
+
+    def _get_message(self, message_id: str) -> Optional[ChatMessage]:
+        if not self._is_uuid(message_id):
+            return None
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("SELECT * FROM chat_messages WHERE id = %s", (message_id,))
+                row = cursor.fetchone()
+        return ChatMessage(**self._message_row(row)) if row else None
+
+    def _get_messages(self, chat_id: str, limit: Optional[int] = None, offset: int = 0) -> List[ChatMessage]:
+        if not self._is_uuid(chat_id):
+            return []
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT * FROM chat_messages
+                    WHERE chat_id = %s
+                    ORDER BY timestamp ASC
+                    LIMIT %s OFFSET %s
+                """, (chat_id, limit, offset))
+                rows = cursor.fetchall()
+        return [ChatMessage(**self._message_row(row)) for row in rows]
+
+    @staticmethod
+    def _is_uuid(value: str) -> bool:
+        # Ids are UUID columns; anything else can't match and would only raise in postgres
+        try:
+            uuid.UUID(value)
+            return True
+        except (ValueError, TypeError, AttributeError):
+            return False
+
+    @staticmethod
+    def _chat_row(row) -> dict:
+        return {**row, "id": str(row["id"])}
+
+    @staticmethod
+    def _message_row(row) -> dict:
+        return {**row, "id": str(row["id"]), "chat_id": str(row["chat_id"])}
+
+def create_chat_store(kind: str = CHAT_STORE) -> ChatStore:
+    if kind == "postgres":
+        return PostgresChatStore()
+    return InMemoryChatStore()
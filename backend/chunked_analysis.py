@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from analysis_cache import analysis_cache_key, normalize_code
+from code_units import CodeUnit, split_units
+from incremental_analysis import parse_unit_result, stitch_code, unique_prefixed, units_outline_html
+from tokens import count_tokens
+
+# Bump whenever create_chunk_prompt, create_reduce_prompt or what goes through the reduce change
+CHUNK_PROMPT_VERSION = 2
+
+# Code tokens packed into one chunk, and the hard cap on a whole chunk or reduce prompt
+ANALYZE_CHUNK_TOKENS = int(os.getenv("ANALYZE_CHUNK_TOKENS", "2000"))
+ANALYZE_CHUNK_MAX_PROMPT_TOKENS = int(os.getenv("ANALYZE_CHUNK_MAX_PROMPT_TOKENS", "6000"))
+# Parallel LLM calls for the chunks of one analysis
+ANALYZE_CHUNK_CONCURRENCY = int(os.getenv("ANALYZE_CHUNK_CONCURRENCY", "4"))
+# Submissions above this many tokens are analyzed in chunks even without chunked=true
+ANALYZE_CHUNKED_ABOVE_TOKENS = int(os.getenv("ANALYZE_CHUNKED_ABOVE_TOKENS", "12000"))
+
+class SubmissionTooLarge(Exception):
+    """The context of a submission leaves no room for code within the prompt cap"""
+
+def create_chunk_prompt(chunk: CodeUnit, index: int, total: int, language: str, context: str) -> str:
+    return f"""
+    You are an expert code analyst. The following {language} code is part {index + 1} of {total}
+    ({chunk.name}) of a larger file; the other parts are analyzed separately. Analyze only this part and provide:
+
+    1. CORRECTED_CODE: Improved version of this part only, a drop-in replacement for it
+    2. EXPLANATION: Short explanation of what this part does and improvements made
+    3. SUGGESTIONS: List of specific improvement suggestions for this part
+    4. WARNINGS: List of potential issues or performance concerns in this part
+
+    Context: {context}
+
+    Code to analyze:
+    ```{language}
+    {chunk.source}
+    ```
+
+    Please format your response as JSON with the following structure:
+    {{
+        "corrected_code": "improved part here",
+        "explanation": "explanation here",
+        "suggestions": ["suggestion 1", "suggestion 2", ...],
+        "warnings": ["warning 1", "warning 2", ...]
+    }}
+    """
+
+def create_reduce_prompt(chunks: list, results: list, language: str, context: str) -> str:
+    parts = "\n\n".join(
+        f"{chunk.name}:\n{json.dumps({key: result[key] for key in ('explanation', 'suggestions', 'warnings')})}"
+        for chunk, result in zip(chunks, results)
+    )
+    return f"""
+    You are an expert code analyst. A {language} file was analyzed in {len(chunks)} parts.
+    Merge the analyses of the parts below into one analysis of the whole file and provide:
+
+    1. EXPLANATION: Clear explanation of what the file does and improvements made
+    2. VISUALIZATION_HTML: HTML/CSS visualization that represents the file's structure, data flow, or algorithms
+    3. SUGGESTIONS: Merged list of improvement suggestions, without duplicates
+    4. WARNINGS: Merged list of potential issues or performance concerns, without duplicates
+
+    Context: {context}
+
+    Analyses of the parts:
+    {parts}
+
+    Please format your response as JSON with the following structure:
+    {{
+        "explanation": "detailed explanation here",
+        "visualization_html": "complete HTML with embedded CSS for visualization",
+        "suggestions": ["suggestion 1", "suggestion 2", ...],
+        "warnings": ["warning 1", "warning 2", ...]
+    }}
+    """
+
+def _split_oversized(unit: CodeUnit, max_tokens: int, model: str) -> list:
+    """Cuts a unit over the budget between lines, and a single line over it every few characters"""
+    pieces, current, current_tokens = [], [], 0
+    start_line = line_number = unit.start_line
+    for line in unit.source.splitlines(keepends=True):
+        tokens = count_tokens(line, model)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(CodeUnit(unit.name, unit.kind, "".join(current), start_line))
+            current, current_tokens = [], 0
+        if not current:
+            start_line = line_number
+        if tokens > max_tokens:
+            # A token covers at least a quarter of a character, so this many characters always fit
+            width = max(1, max_tokens // 4)
+            pieces.extend(CodeUnit(unit.name, unit.kind, line[start:start + width], line_number)
+                          for start in range(0, len(line), width))
+        else:
+            current.append(line)
+            current_tokens += tokens
+        line_number += 1
+    if current:
+        pieces.append(CodeUnit(unit.name, unit.kind, "".join(current), start_line))
+    return pieces
+
+def _ends_chunk(unit: CodeUnit, tokens: int, target: float) -> bool:
+    """
+        Content-defined boundary: a unit closes its chunk with probability
+        tokens / target, decided by a hash of its own source, so chunks average
+        `target` tokens and the same units group the same way wherever they sit.
+    """
+    digest = hashlib.sha1(normalize_code(unit.source).encode()).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32 < tokens / target
+
+def pack_chunks(units: list, max_tokens: int, model: str) -> list:
+    """
+        Consecutive units grouped into chunks of at most `max_tokens` code tokens,
+        named by their lines.
+
+        Chunks end at content-defined unit boundaries rather than wherever the
+        budget runs out, so an edit only regroups the units up to the next
+        boundary and every later chunk keeps its source, and its cache entry.
+        Units over the budget are cut between lines into chunks of their own.
+    """
+    groups, current, current_tokens = [], [], 0
+    target = max_tokens / 2
+
+    def close():
+        nonlocal current, current_tokens
+        if current:
+            groups.append(current)
+        current, current_tokens = [], 0
+
+    for unit in units:
+        tokens = count_tokens(unit.source, model)
+        if tokens > max_tokens:
+            close()
+            groups.extend([piece] for piece in _split_oversized(unit, max_tokens, model))
+            continue
+        if current_tokens + tokens > max_tokens:
+            close()
+        current.append(unit)
+        current_tokens += tokens
+        if _ends_chunk(unit, tokens, target):
+            close()
+    close()
+
+    chunks = []
+    for group in groups:
+        source = "".join(piece.source for piece in group)
+        start = group[0].start_line
+        end = group[-1].start_line + max(group[-1].source.rstrip("\n").count("\n"), 0)
+        chunks.append(CodeUnit(f"lines {start}-{end}", "chunk", source, start))
+    return chunks
+
+def merge_locally(chunks: list, results: list, analyzed: set) -> dict:
+    return {
+        "explanation": "\n\n".join(
+            f"{chunk.name}: {result['explanation']}" for chunk, result in zip(chunks, results) if result["explanation"]
+        ),
+        "visualization_html": units_outline_html(chunks, analyzed),
+        "suggestions": unique_prefixed(chunks, results, "suggestions"),
+        "warnings": unique_prefixed(chunks, results, "warnings")
+    }
+
+async def analyze_in_chunks(llm, cache, model: str, code: str, language: str, context: str,
+                            bypass_cache: bool = False,
+                            chunk_tokens: int = ANALYZE_CHUNK_TOKENS,
+                            max_prompt_tokens: int = ANALYZE_CHUNK_MAX_PROMPT_TOKENS,
+                            concurrency: int = ANALYZE_CHUNK_CONCURRENCY) -> tuple:
+    """
+        Map-reduce analysis of a large submission; returns (result, stats).
+
+        The code is split at top-level units and packed into chunks of at most
+        `chunk_tokens` (see pack_chunks), fewer wherever a prompt would exceed `max_prompt_tokens`.
+        Chunks are analyzed in parallel and cached one by one; a reduce call then merges
+        their explanations, suggestions and warnings and writes the visualization, also
+        for a single chunk, and the corrected code of the chunks is stitched back
+        together in order. Raises SubmissionTooLarge when the context alone leaves no
+        room for code under `max_prompt_tokens`.
+    """
+    result_key = analysis_cache_key(code, language, context, model, prompt_version=f"chunked-{CHUNK_PROMPT_VERSION}")
+    if not bypass_cache:
+        cached_result = await cache.get(result_key)
+        if cached_result is not None:
+            return cached_result, {"cached": True}
+
+    # The prompt around the code takes about the same tokens in every chunk, leave room for it
+    empty = CodeUnit("lines 000000-000000", "chunk", "", 0)
+    overhead = count_tokens(create_chunk_prompt(empty, 99999, 99999, language, context), model)
+    code_budget = min(chunk_tokens, max_prompt_tokens - overhead)
+    if code_budget < 50:
+        raise SubmissionTooLarge(f"context leaves no room for code within {max_prompt_tokens} prompt tokens")
+
+    # Splitting and token counting are CPU-bound, keep them off the event loop
+    units = await asyncio.to_thread(split_units, code, language)
+    chunks = await asyncio.to_thread(pack_chunks, units, code_budget, model)
+    keys = [analysis_cache_key(chunk.source, language, context, model, prompt_version=f"chunk-{CHUNK_PROMPT_VERSION}")
+            for chunk in chunks]
+
+    cached = [None] * len(chunks)
+    if not bypass_cache:
+        cached = await asyncio.gather(*(cache.get(key) for key in keys))
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    prompt_sizes = []
+
+    async def analyze_chunk(index: int) -> dict:
+        chunk = chunks[index]
+        prompt = create_chunk_prompt(chunk, index, len(chunks), language, context)
+        prompt_sizes.append(count_tokens(prompt, model))
+        async with semaphore:
+            response = await llm.ainvoke(prompt)
+
+        result, complete = parse_unit_result(chunk, response.text)
+        if complete:
+            await cache.set(keys[index], chunk.source, result, analysis_type="chunk")
+        return result, complete
+
+    analyzed = [index for index, result in enumerate(cached) if result is None]
+    fresh = dict(zip(analyzed, await asyncio.gather(*(analyze_chunk(index) for index in analyzed))))
+    results = [fresh[index][0] if index in fresh else cached[index] for index in range(len(chunks))]
+    complete = all(done for _, done in fresh.values())
+
+    merged = merge_locally(chunks, results, set(analyzed))
+    reduced = False
+    # Even a single chunk goes through the reduce: it is what writes the visualization
+    prompt = create_reduce_prompt(chunks, results, language, context)
+    reduce_tokens = count_tokens(prompt, model)
+    # Too many parts to merge in one prompt: keep the local merge instead
+    if reduce_tokens <= max_prompt_tokens:
+        prompt_sizes.append(reduce_tokens)
+        response = await llm.ainvoke(prompt)
+        try:
+            data = json.loads(response.text)
+            merged = {
+                "explanation": str(data.get("explanation") or merged["explanation"]),
+                "visualization_html": str(data.get("visualization_html") or merged["visualization_html"]),
+                "suggestions": [str(item) for item in data.get("suggestions") or []],
+                "warnings": [str(item) for item in data.get("warnings") or []]
+            }
+            reduced = True
+        except (json.JSONDecodeError, AttributeError):
+            pass
+
+    result = {"corrected_code": stitch_code(chunks, results), **merged}
+    # Only complete analyses are cached, like in analyze_code_with_gemini
+    if complete and reduced:
+        await cache.set(result_key, code, result, analysis_type="chunked")
+
+    stats = {
+        "chunks": len(chunks),
+        "chunks_analyzed": len(analyzed),
+        "reduced": reduced,
+        "prompt_tokens": sum(prompt_sizes),
+        "max_prompt_tokens": max(prompt_sizes, default=0)
+    }
+    return result, stats
@@ -0,0 +1,62 @@
+import difflib
+import hashlib
+import json
+import zlib
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def compress_snapshot(text: str) -> bytes:
+    return zlib.compress(text.encode(), 9)
+
+def decompress_snapshot(data: bytes) -> str:
+    return zlib.decompress(data).decode()
+
+def make_delta(old: str, new: str) -> bytes:
+    """
+        Compressed line diff turning `old` into `new`.
+
+        Only the changed ranges are kept, as [start, end, replacement lines] against
+        the old lines; unchanged lines are copied from `old` when the delta is applied.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    ops = [
+        [i1, i2, new_lines[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"
+    ]
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode(), 9)
+
+def apply_delta(old: str, delta: bytes) -> str:
+    old_lines = old.splitlines(keepends=True)
+    result, position = [], 0
+    for start, end, lines in json.loads(zlib.decompress(delta)):
+        result.extend(old_lines[position:start])
+        result.extend(lines)
+        position = end
+    result.extend(old_lines[position:])
+    return "".join(result)
+
+def encode_revision(previous: str, text: str, since_snapshot: int, interval: int) -> tuple:
+    """
+        (kind, data) for a new revision. `since_snapshot` is how many revisions the
+        new one comes after the last snapshot (None when there is no history yet).
+        It becomes a delta against `previous` while that stays under `interval`
+        revisions from the snapshot and is smaller than a snapshot of its own.
+    """
+    snapshot = compress_snapshot(text)
+    if previous is None or since_snapshot is None or since_snapshot >= interval:
+        return "snapshot", snapshot
+
+    delta = make_delta(previous, text)
+    if len(delta) < len(snapshot):
+        return "delta", delta
+    return "snapshot", snapshot
+
+def rebuild(snapshot: bytes, deltas: list) -> str:
+    """Text of the revision reached by applying `deltas` in order to a compressed snapshot"""
+    text = decompress_snapshot(snapshot)
+    for delta in deltas:
+        text = apply_delta(text, delta)
+    return text
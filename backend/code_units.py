@@ -0,0 +1,86 @@
+import ast
+import re
+from typing import List, NamedTuple
+
+class CodeUnit(NamedTuple):
+    name: str
+    kind: str
+    source: str
+    start_line: int
+
+# A line that closes a block in brace/`end` languages; the next top-level line starts a unit
+BLOCK_END_RE = re.compile(r"^(\}[;,)]*|end)\s*$")
+COMMENT_PREFIXES = ("#", "//", "/*", "*", "--")
+
+def _python_boundaries(tree: ast.Module, lines: List[str]) -> List[tuple]:
+    """(line index, name, kind) of every unit start: each def/class and each run of other statements"""
+    boundaries = []
+    previous_was_definition = True
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list]) - 1
+            # Comments directly above a definition belong to it
+            while start > 0 and lines[start - 1].lstrip().startswith("#"):
+                start -= 1
+            kind = "class" if isinstance(node, ast.ClassDef) else "function"
+            boundaries.append((start, node.name, kind))
+            previous_was_definition = True
+        elif previous_was_definition:
+            boundaries.append((node.lineno - 1, f"module code at line {node.lineno}", "module"))
+            previous_was_definition = False
+    return boundaries
+
+def _units_from_boundaries(lines: List[str], boundaries: List[tuple]) -> List[CodeUnit]:
+    if not boundaries or boundaries[0][0] > 0:
+        boundaries = [(0, "module header", "module")] + boundaries
+
+    units = []
+    for index, (start, name, kind) in enumerate(boundaries):
+        end = boundaries[index + 1][0] if index + 1 < len(boundaries) else len(lines)
+        if end > start:
+            units.append(CodeUnit(name, kind, "".join(lines[start:end]), start + 1))
+    return units
+
+def split_python(code: str) -> List[CodeUnit]:
+    """Top-level functions and classes of Python code, with the statements between them grouped; raises SyntaxError"""
+    tree = ast.parse(code)
+    lines = code.splitlines(keepends=True)
+    return _units_from_boundaries(lines, _python_boundaries(tree, lines))
+
+def split_fallback(code: str) -> List[CodeUnit]:
+    """
+        Language-agnostic splitter: a unit starts at an unindented line that follows
+        a blank line or the end of a block (`}` or `end`), so top-level functions,
+        classes and statements of brace languages land in separate units.
+    """
+    lines = code.splitlines(keepends=True)
+    boundaries = []
+    previous = ""
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        starts_top_level = stripped and not line[0].isspace() and not BLOCK_END_RE.match(stripped)
+        after_break = not previous.strip() or BLOCK_END_RE.match(previous.strip())
+        if starts_top_level and after_break and index > 0:
+            start = index
+            # Keep comments directly above together with what they describe
+            while start > 0 and lines[start - 1].strip().startswith(COMMENT_PREFIXES):
+                start -= 1
+            boundaries.append((start, f"block at line {start + 1}", "block"))
+        previous = line
+
+    # Drop boundaries swallowed by comment blocks moving upwards
+    unique, seen = [], set()
+    for boundary in boundaries:
+        if boundary[0] not in seen:
+            seen.add(boundary[0])
+            unique.append(boundary)
+    return _units_from_boundaries(lines, sorted(unique))
+
+def split_units(code: str, language: str) -> List[CodeUnit]:
+    """Splits code into top-level units whose sources concatenate back to `code`"""
+    if language.lower() in ("python", "py"):
+        try:
+            return split_python(code)
+        except (SyntaxError, ValueError):
+            pass
+    return split_fallback(code)
@@ -0,0 +1,150 @@
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+
+from tokens import count_tokens
+
+# Tokens of retrieved docs and snippets sent with the final answer call, 0 to only drop duplicates
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+# Context7 sections and formatted snippets both end with a line of dashes
+SEPARATOR_RE = re.compile(r"^\s*-{10,}\s*$", re.MULTILINE)
+SEPARATOR = "\n----------------------\n"
+TERM_RE = re.compile(r"[a-z_][a-z0-9_]+")
+STOPWORDS = {"the", "and", "for", "with", "how", "what", "use", "using", "to", "of", "in", "is", "it", "an", "do",
+             "can", "this", "that", "my", "me", "on", "from", "get", "are", "be", "or", "by", "as", "at", "you"}
+
+def split_chunks(text: str) -> list:
+    return [chunk.strip() for chunk in SEPARATOR_RE.split(text) if chunk.strip()]
+
+def terms(text: str) -> list:
+    return [term for term in TERM_RE.findall(text.lower()) if term not in STOPWORDS]
+
+def chunk_key(chunk: str) -> str:
+    # The same section fetched for two topics differs at most in whitespace
+    return hashlib.sha1(" ".join(chunk.lower().split()).encode()).hexdigest()
+
+def bm25_scores(queries: list, documents: list, k1: float = 1.2, b: float = 0.75) -> list:
+    """BM25 score of every document against its own query terms, with statistics over all `documents`"""
+    counts = [Counter(document) for document in documents]
+    average = sum(len(document) for document in documents) / max(len(documents), 1) or 1
+    frequency = Counter(term for count in counts for term in count)
+    total = len(documents)
+
+    scores = []
+    for query, count, document in zip(queries, counts, documents):
+        score = 0.0
+        for term in set(query):
+            tf = count.get(term, 0)
+            if tf:
+                idf = math.log(1 + (total - frequency[term] + 0.5) / (frequency[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(document) / average))
+        scores.append(score)
+    return scores
+
+def split_budget(demands: dict, budget: int) -> dict:
+    """Equal shares of `budget` per key, with what a key doesn't need handed to the others"""
+    allocation, pending, remaining = {}, dict(demands), budget
+    while pending:
+        share = remaining // len(pending)
+        satisfied = {key: demand for key, demand in pending.items() if demand <= share}
+        if not satisfied:
+            allocation.update({key: share for key in pending})
+            break
+        for key, demand in satisfied.items():
+            allocation[key] = demand
+            remaining -= demand
+            del pending[key]
+    return allocation
+
+class ContextAssembler:
+    """
+        Fits the tool results of one turn into `token_budget` tokens before the
+        final answer call.
+
+        Every docs or snippets result is split into sections at its dashed
+        separators. Sections already returned by an earlier call are dropped, the
+        rest are ranked with BM25 against the user query plus the call's topic, and
+        each library gets an equal share of the budget (unused shares go to the
+        others) filled with its best sections. Kept sections stay in their original
+        order; a result without separators is a single section.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, model: str = "gpt-4.1"):
+        self.token_budget = token_budget
+        self.model = model
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def assemble(self, query: str, tool_calls: list, tool_messages: list) -> tuple:
+        """Returns the tool messages to send, in the same order, and their stats"""
+        sections, seen, duplicates = [], set(), 0
+        for index, (tool_call, message) in enumerate(zip(tool_calls, tool_messages)):
+            chunks = split_chunks(str(message.content))
+            library = tool_call['args'].get('lib_name', tool_call['name'])
+            topic = tool_call['args'].get('topic', "")
+            for position, chunk in enumerate(chunks):
+                key = chunk_key(chunk)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                sections.append({
+                    "message": index, "position": position, "library": library, "text": chunk,
+                    "terms": terms(chunk), "query": terms(f"{query} {topic}"),
+                    "tokens": count_tokens(chunk, self.model)
+                })
+
+        tokens_before = sum(count_tokens(str(message.content), self.model) for message in tool_messages)
+
+        for section, score in zip(sections, bm25_scores([s["query"] for s in sections], [s["terms"] for s in sections])):
+            section["score"] = score
+
+        demands = Counter()
+        for section in sections:
+            demands[section["library"]] += section["tokens"]
+        budget = self.token_budget if self.token_budget > 0 else sum(demands.values())
+        allocation = split_budget(dict(demands), budget)
+
+        kept, libraries = set(), {}
+        for library, allowance in allocation.items():
+            used = 0
+            candidates = sorted((s for s in sections if s["library"] == library), key=lambda s: -s["score"])
+            for section in candidates:
+                # Skip what doesn't fit and keep filling with smaller sections
+                if used + section["tokens"] <= allowance:
+                    used += section["tokens"]
+                    kept.add((section["message"], section["position"]))
+            libraries[library] = {"budget": allowance, "tokens_unique": demands[library], "tokens_after": used}
+
+        messages = []
+        for index, message in enumerate(tool_messages):
+            chunks = [s["text"] for s in sections if s["message"] == index and (index, s["position"]) in kept]
+            content = SEPARATOR.join(chunks) if chunks else "No further sections: returned by another call or over the context budget."
+            messages.append(message.model_copy(update={"content": content}))
+
+        tokens_after = sum(count_tokens(str(message.content), self.model) for message in messages)
+        self.requests += 1
+        self.tokens_before += tokens_before
+        self.tokens_after += tokens_after
+
+        return messages, {
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "budget": self.token_budget,
+            "sections": len(sections) + duplicates,
+            "duplicates": duplicates,
+            "sections_kept": len(kept),
+            "libraries": libraries
+        }
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "saved_ratio": round(1 - self.tokens_after / self.tokens_before, 4) if self.tokens_before else 0.0
+        }
@@ -0,0 +1,149 @@
+import os
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+
+from tokens import count_message_tokens
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "12000"))
+MEMORY_IDLE_TTL = float(os.getenv("MEMORY_IDLE_TTL", "1800"))
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+
+class _Session:
+    def __init__(self):
+        # Each turn is [HumanMessage, AIMessage(tool_calls), ToolMessage..., AIMessage]
+        # and is kept or dropped as a whole so tool calls never lose their results
+        self.turns = []
+        self.turn_tokens = []
+        self.summary = ""
+        self.last_used = time.monotonic()
+
+class ConversationMemory:
+    """
+        Conversation history keyed by chat/session id.
+
+        The prompt for a session is kept under `token_budget` tokens by dropping
+        the oldest turns. When a `summarizer(previous_summary, dropped_messages)`
+        coroutine is given, dropped turns are folded into a running summary instead
+        of being forgotten. Sessions idle for longer than `idle_ttl` seconds are
+        evicted, and at most `max_sessions` are kept (least recently used first out).
+
+        Every callable in `prompt_hooks` is called as `hook(session_id, stats)`
+        whenever a prompt is built, with the prompt token count and what was dropped.
+    """
+
+    def __init__(self, token_budget: int = MEMORY_TOKEN_BUDGET, idle_ttl: float = MEMORY_IDLE_TTL,
+                 max_sessions: int = MEMORY_MAX_SESSIONS, summarizer=None):
+        self.token_budget = token_budget
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.summarizer = summarizer
+        self.prompt_hooks = []
+        self._sessions = OrderedDict()
+        self.prompts = 0
+        self.prompt_tokens = 0
+        self.dropped_messages = 0
+        self.summaries = 0
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        # OrderedDict is in least recently used order, so stop at the first fresh session
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+
+    def _session(self, session_id: str) -> _Session:
+        self._evict_idle()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    async def build_prompt(self, session_id: str, system_prompt: str, pending: list) -> tuple:
+        """Returns the messages to send (system prompt, summary, kept history, `pending`) and their stats"""
+        session = self._session(session_id)
+
+        head = [SystemMessage(system_prompt)]
+        fixed_tokens = count_message_tokens(head + pending)
+
+        dropped = []
+        while session.turns and fixed_tokens + self._history_tokens(session) > self.token_budget:
+            dropped.extend(session.turns.pop(0))
+            session.turn_tokens.pop(0)
+
+        if dropped and self.summarizer:
+            session.summary = await self.summarizer(session.summary, dropped)
+
+        history = [message for turn in session.turns for message in turn]
+        prompt = head + self._summary_messages(session) + history + pending
+
+        stats = {
+            "prompt_tokens": count_message_tokens(prompt),
+            "history_turns": len(session.turns),
+            "dropped_messages": len(dropped),
+            "summarized": bool(dropped and self.summarizer)
+        }
+        self.prompts += 1
+        self.prompt_tokens += stats["prompt_tokens"]
+        self.dropped_messages += stats["dropped_messages"]
+        self.summaries += stats["summarized"]
+        for hook in self.prompt_hooks:
+            hook(session_id, stats)
+
+        return prompt, stats
+
+    def add_turn(self, session_id: str, messages: list):
+        session = self._session(session_id)
+        session.turns.append(list(messages))
+        session.turn_tokens.append(count_message_tokens(messages))
+
+    def has_history(self, session_id: str) -> bool:
+        self._evict_idle()
+        session = self._sessions.get(session_id)
+        return session is not None and bool(session.turns or session.summary)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "prompts": self.prompts,
+            "prompt_tokens": self.prompt_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.prompts, 1) if self.prompts else 0.0,
+            "dropped_messages": self.dropped_messages,
+            "summaries": self.summaries
+        }
+
+    def clear(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def _summary_messages(self, session: _Session) -> list:
+        if not session.summary:
+            return []
+        return [SystemMessage(f"Summary of the earlier conversation:\n{session.summary}")]
+
+    def _history_tokens(self, session: _Session) -> int:
+        return sum(session.turn_tokens) + count_message_tokens(self._summary_messages(session))
+
+def summary_prompt(previous_summary: str, dropped: list) -> str:
+    # Tool results are retrieved docs, they can be fetched again and are left out
+    lines = []
+    for message in dropped:
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {message.content}")
+        elif isinstance(message, AIMessage) and message.content:
+            lines.append(f"Assistant: {message.content}")
+
+    transcript = "\n".join(lines)
+
+    return (
+        "Update the running summary of a coding assistant conversation with the turns below. "
+        "Keep the user's goals, decisions, code names and open questions; stay under 200 words.\n\n"
+        f"Current summary:\n{previous_summary or '(empty)'}\n\nNew turns:\n{transcript}"
+    )
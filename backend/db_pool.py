@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+# Seconds to wait for the server when opening a connection, so an unreachable host can't hang a checkout
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became free within the pool timeout"""
+
+class DBPool:
+    """
+        Process-wide pool of psycopg2 connections.
+
+        Opens `min_size` connections up front and keeps up to `max_size` around
+        (psycopg2's own pools close everything above their minimum on return,
+        which reconnects under any real load). Checkouts wait up to
+        `timeout` seconds for a free connection instead of failing straight away,
+        and a connection that sat idle for more than `healthcheck_after` seconds is
+        checked with `SELECT 1` first; broken ones are dropped and replaced. Every
+        connection runs with `statement_timeout` set and is opened with
+        `connect_timeout`, and connections come back rolled back if a transaction
+        was left open.
+
+        `open()` is called on startup and `close()` on shutdown; a checkout before
+        `open()` opens the pool lazily so scripts can use it directly.
+    """
+
+    def __init__(self, config: dict, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT, healthcheck_after: float = DB_POOL_HEALTHCHECK_AFTER,
+                 statement_timeout_ms: int = DB_STATEMENT_TIMEOUT_MS, connect_timeout: int = DB_CONNECT_TIMEOUT):
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self.statement_timeout_ms = statement_timeout_ms
+        self.connect_timeout = connect_timeout
+        self._idle = None
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.in_use = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _connect(self):
+        options = f"-c statement_timeout={self.statement_timeout_ms}" if self.statement_timeout_ms else None
+        return psycopg2.connect(options=options, connect_timeout=self.connect_timeout or None, **self.config)
+
+    def open(self):
+        with self._lock:
+            if self._idle is None:
+                connections = []
+                try:
+                    for _ in range(self.min_size):
+                        connections.append(self._connect())
+                except Exception:
+                    # Don't leak the connections opened before the failure
+                    for conn in connections:
+                        conn.close()
+                    raise
+                now = time.monotonic()
+                self._idle = deque((conn, now) for conn in connections)
+        return self
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, None
+        for conn, _ in idle or ():
+            conn.close()
+
+    @property
+    def opened(self) -> bool:
+        return self._idle is not None
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.timeouts += 1
+            raise PoolTimeout(f"no database connection free after {self.timeout}s")
+
+        try:
+            if self._idle is None:
+                self.open()
+            while True:
+                with self._lock:
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    conn = self._connect()
+                    break
+                conn, last_used = idle
+                if self._healthy(conn, last_used):
+                    break
+                with self._lock:
+                    self.discarded += 1
+                conn.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return conn
+
+    def _checkin(self, conn):
+        try:
+            broken = bool(conn.closed)
+            if not broken and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+
+            with self._lock:
+                self.discarded += broken
+                if not broken and self._idle is not None:
+                    self._idle.append((conn, time.monotonic()))
+                    conn = None
+            if conn is not None:
+                conn.close()
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def stats(self) -> dict:
+        idle = len(self._idle) if self._idle is not None else 0
+        return {
+            "open": self.opened,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "in_use": self.in_use,
+            "idle": idle,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "discarded": self.discarded,
+            "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3)
+        }
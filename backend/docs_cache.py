@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os
+
+from cache import TTLCache, DiskCache
+
+DOCS_CACHE_TTL = float(os.getenv("DOCS_CACHE_TTL", "86400"))
+DOCS_CACHE_MAX_ENTRIES = int(os.getenv("DOCS_CACHE_MAX_ENTRIES", "512"))
+DOCS_CACHE_MEMORY_BYTES = int(os.getenv("DOCS_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+DOCS_CACHE_DISK_BYTES = int(os.getenv("DOCS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+DOCS_CACHE_PATH = os.getenv("DOCS_CACHE_PATH", ".cache/docs_cache.sqlite3")
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+class DocsCache:
+    """
+        Two-tier cache for Context7 documentation responses.
+
+        Lookups go to the in-memory LRU first and then to the SQLite file, which
+        keeps entries across restarts. Disk hits are promoted back into memory
+        for whatever remains of their disk TTL.
+        Only successful responses should be stored. Every `set` is a fresh fetch
+        from upstream, and each callable in `refresh_listeners` is called with the
+        key so anything derived from the old docs can be invalidated.
+    """
+
+    def __init__(self, path: str = DOCS_CACHE_PATH, ttl: float = DOCS_CACHE_TTL,
+                 max_entries: int = DOCS_CACHE_MAX_ENTRIES, memory_bytes: int = DOCS_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = DOCS_CACHE_DISK_BYTES):
+        self.memory = TTLCache(maxsize=max_entries, ttl=ttl, max_bytes=memory_bytes)
+        self.disk = DiskCache(path, ttl=ttl, max_bytes=disk_bytes) if path else None
+        self.refresh_listeners = []
+
+    @staticmethod
+    def key(base_url: str, topic: str, tokens: int) -> str:
+        return json.dumps([base_url.rstrip("/"), normalize_topic(topic), tokens])
+
+    async def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+
+        entry = await asyncio.to_thread(self.disk.get_entry, key)
+        if entry is None:
+            return None
+        value, expires_in = entry
+        # Keep the disk expiry: a fresh TTL would let the entry outlive DOCS_CACHE_TTL
+        self.memory.set(key, value, ttl=max(expires_in, 0.001))
+        return value
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+        for listener in self.refresh_listeners:
+            listener(key)
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None
+        }
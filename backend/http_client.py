@@ -0,0 +1,98 @@
+import asyncio
+import os
+import random
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.25"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout,
+                    httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+class HttpClient:
+    """
+        Shared async HTTP client for the tools.
+
+        One pooled httpx.AsyncClient keeps connections alive between calls. Every
+        request has a timeout, and at most `max_connections_per_host` requests run
+        against one host at a time. 429 and 5xx responses and connection errors are
+        retried up to `max_retries` times with full-jitter exponential backoff, and
+        numeric Retry-After headers are honoured. The last response is returned even
+        if it is still an error; the last exception is raised if every attempt failed.
+
+        `transport` lets the client run against a local stand-in server or an
+        httpx.MockTransport.
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 max_retries: int = HTTP_MAX_RETRIES, backoff_base: float = HTTP_BACKOFF_BASE,
+                 backoff_max: float = HTTP_BACKOFF_MAX, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_connections_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST, transport=None):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+        self.max_connections_per_host = max_connections_per_host
+        self.transport = transport
+        self._client = None
+        self._host_slots = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.transport)
+        return self._client
+
+    def _slots(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_slots[host]
+
+    def _backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            last_try = attempt == self.max_retries
+            try:
+                async with self._slots(url):
+                    response = await self.client.request(method, url, **kwargs)
+            except RETRY_EXCEPTIONS:
+                if last_try:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES or last_try:
+                return response
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Shared by all tools, closed on application shutdown
+http_client = HttpClient()
@@ -0,0 +1,163 @@
+import asyncio
+import html
+import json
+import os
+
+from analysis_cache import analysis_cache_key
+from code_units import CodeUnit, split_units
+from tokens import count_tokens
+
+# Bump whenever create_unit_prompt changes, so unit results of the old prompt stop matching
+UNIT_PROMPT_VERSION = 1
+
+# Parallel LLM calls for the changed units of one analysis
+ANALYZE_UNIT_CONCURRENCY = int(os.getenv("ANALYZE_UNIT_CONCURRENCY", "4"))
+
+def create_unit_prompt(unit: CodeUnit, language: str, context: str, outline: list) -> str:
+    return f"""
+    You are an expert code analyst. The following {language} code is one top-level unit
+    ({unit.kind} `{unit.name}`) of a larger file. Analyze only this unit and provide:
+
+    1. CORRECTED_CODE: Improved version of this unit only, a drop-in replacement for it
+    2. EXPLANATION: Short explanation of what the unit does and improvements made
+    3. SUGGESTIONS: List of specific improvement suggestions for this unit
+    4. WARNINGS: List of potential issues or performance concerns in this unit
+
+    Context: {context}
+
+    Other units of the file, for reference: {", ".join(outline) or "none"}
+
+    Unit to analyze:
+    ```{language}
+    {unit.source}
+    ```
+
+    Please format your response as JSON with the following structure:
+    {{
+        "corrected_code": "improved unit here",
+        "explanation": "explanation here",
+        "suggestions": ["suggestion 1", "suggestion 2", ...],
+        "warnings": ["warning 1", "warning 2", ...]
+    }}
+    """
+
+def largest_unit_prompt_tokens(code: str, language: str, context: str, model: str) -> int:
+    """Tokens of the largest unit prompt analyze_incrementally would send for `code`, give or take a unit name"""
+    units = split_units(code, language) or [CodeUnit("module header", "module", code, 1)]
+    empty = CodeUnit("", "", "", 0)
+    overhead = count_tokens(create_unit_prompt(empty, language, context, [unit.name for unit in units]), model)
+    return overhead + max(count_tokens(unit.source, model) for unit in units)
+
+def unit_cache_key(unit: CodeUnit, language: str, context: str, model: str) -> str:
+    # Only the unit's own source counts: editing one function leaves the keys of the others alone
+    return analysis_cache_key(unit.source, language, context, model, prompt_version=f"unit-{UNIT_PROMPT_VERSION}")
+
+def parse_unit_result(unit: CodeUnit, text: str) -> tuple:
+    """(result, complete) from an LLM reply; an unparseable reply keeps the unit as it was"""
+    try:
+        data = json.loads(text)
+        return {
+            "corrected_code": str(data.get("corrected_code") or unit.source),
+            "explanation": str(data.get("explanation", "")),
+            "visualization_html": "",
+            "suggestions": [str(item) for item in data.get("suggestions") or []],
+            "warnings": [str(item) for item in data.get("warnings") or []]
+        }, True
+    except (json.JSONDecodeError, AttributeError):
+        return {
+            "corrected_code": unit.source,
+            "explanation": text,
+            "visualization_html": "",
+            "suggestions": [],
+            "warnings": []
+        }, False
+
+def stitch_code(units: list, results: list) -> str:
+    """Corrected code of every unit joined in order, each keeping the blank lines that followed it"""
+    return "".join(
+        result["corrected_code"].rstrip() + unit.source[len(unit.source.rstrip()):]
+        for unit, result in zip(units, results)
+    )
+
+def unique_prefixed(units: list, results: list, field: str) -> list:
+    items, seen = [], set()
+    for unit, result in zip(units, results):
+        for item in result[field]:
+            if item not in seen:
+                seen.add(item)
+                items.append(f"{unit.name}: {item}")
+    return items
+
+def units_outline_html(units: list, analyzed: set) -> str:
+    """Outline of the file's units, marking the ones analyzed in this run"""
+    rows = "".join(
+        f"<li class=\"{'analyzed' if index in analyzed else 'cached'}\">"
+        f"<code>{html.escape(unit.name)}</code> <span>{unit.kind}, line {unit.start_line}</span>"
+        f"<em>{'analyzed' if index in analyzed else 'unchanged'}</em></li>"
+        for index, unit in enumerate(units)
+    )
+    return (
+        "<style>.units{font-family:sans-serif;list-style:none;padding:0}"
+        ".units li{padding:6px 10px;margin:4px 0;border-left:4px solid #9ca3af;background:#f9fafb}"
+        ".units li.analyzed{border-color:#2563eb}.units span{color:#6b7280;margin:0 8px}"
+        ".units em{float:right;color:#6b7280}</style>"
+        f"<ul class=\"units\">{rows}</ul>"
+    )
+
+def merge_unit_results(units: list, results: list, analyzed: set) -> dict:
+    return {
+        "corrected_code": stitch_code(units, results),
+        "explanation": "\n\n".join(
+            f"{unit.name}: {result['explanation']}" for unit, result in zip(units, results) if result["explanation"]
+        ),
+        "visualization_html": units_outline_html(units, analyzed),
+        "suggestions": unique_prefixed(units, results, "suggestions"),
+        "warnings": unique_prefixed(units, results, "warnings")
+    }
+
+async def analyze_incrementally(llm, cache, model: str, code: str, language: str, context: str,
+                                bypass_cache: bool = False, concurrency: int = ANALYZE_UNIT_CONCURRENCY) -> tuple:
+    """
+        Analyzes `code` one top-level unit at a time and returns (result, stats).
+
+        Every unit's result is cached under a hash of the unit's own source, so after
+        an edit only the units whose source changed go to the LLM; the others are
+        read back from `cache` and the results of all units are merged.
+    """
+    units = split_units(code, language) or [CodeUnit("module header", "module", code, 1)]
+    keys = [unit_cache_key(unit, language, context, model) for unit in units]
+
+    cached = [None] * len(units)
+    if not bypass_cache:
+        cached = await asyncio.gather(*(cache.get(key) for key in keys))
+
+    outline = [unit.name for unit in units]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    prompt_tokens = 0
+
+    async def analyze_unit(index: int) -> dict:
+        nonlocal prompt_tokens
+        unit = units[index]
+        prompt = create_unit_prompt(unit, language, context, [name for name in outline if name != unit.name])
+        prompt_tokens += count_tokens(prompt, model)
+        async with semaphore:
+            response = await llm.ainvoke(prompt)
+
+        result, complete = parse_unit_result(unit, response.text)
+        if complete:
+            await cache.set(keys[index], unit.source, result, analysis_type="unit")
+        return result
+
+    analyzed = [index for index, result in enumerate(cached) if result is None]
+    fresh = dict(zip(analyzed, await asyncio.gather(*(analyze_unit(index) for index in analyzed))))
+    results = [fresh.get(index) or cached[index] for index in range(len(units))]
+
+    stats = {
+        "units": len(units),
+        "units_analyzed": len(analyzed),
+        "units_cached": len(units) - len(analyzed),
+        "code_tokens": count_tokens(code, model),
+        "code_tokens_sent": sum(count_tokens(units[index].source, model) for index in analyzed),
+        "prompt_tokens": prompt_tokens
+    }
+    return merge_unit_results(units, results, set(analyzed)), stats
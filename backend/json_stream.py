@@ -0,0 +1,117 @@
+import json
+
+WHITESPACE = " \t\r\n"
+
+class JsonFieldStream:
+    """
+        Incremental parser for the top-level fields of a single JSON object.
+
+        Text is fed in pieces as the model streams it; `feed` returns the
+        (key, value) pairs that completed within that piece, and `fields` holds
+        every pair completed so far, so a reply that breaks off still yields the
+        fields before the break. Anything before the opening brace, like a
+        ```json fence, is skipped. Control characters inside strings are accepted
+        because models often put raw newlines in code.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self.errors = 0
+        self._state = "start"
+        self._key = None
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def _parse(self, text: str) -> tuple:
+        try:
+            return json.loads(text, strict=False), True
+        except json.JSONDecodeError:
+            self.errors += 1
+            return None, False
+
+    def _complete_key(self):
+        key, ok = self._parse("".join(self._buffer))
+        self._key = key if ok else None
+        self._state = "colon"
+
+    def _complete_value(self, text: str, completed: list):
+        value, ok = self._parse(text)
+        # A malformed value is skipped, the fields after it still count
+        if ok and self._key is not None:
+            self.fields[self._key] = value
+            completed.append((self._key, value))
+        self._state = "key"
+
+    def _scan_string(self, char: str) -> bool:
+        """Tracks escapes inside a string; True on its closing quote"""
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            return True
+        return False
+
+    def feed(self, text: str) -> list:
+        completed = []
+        for char in text:
+            state = self._state
+            if state == "start":
+                if char == "{":
+                    self._state = "key"
+            elif state == "key":
+                if char == '"':
+                    self._buffer, self._in_string, self._state = [char], True, "key_string"
+                elif char == "}":
+                    self._state, self.done = "end", True
+            elif state == "key_string":
+                self._buffer.append(char)
+                if self._scan_string(char):
+                    self._complete_key()
+            elif state == "colon":
+                if char == ":":
+                    self._state = "value_start"
+            elif state == "value_start":
+                if char in WHITESPACE:
+                    continue
+                self._buffer, self._depth = [char], 0
+                if char == '"':
+                    self._in_string, self._state = True, "string"
+                elif char in "{[":
+                    self._depth, self._state = 1, "nested"
+                else:
+                    self._state = "scalar"
+            elif state == "string":
+                self._buffer.append(char)
+                if self._scan_string(char):
+                    self._complete_value("".join(self._buffer), completed)
+            elif state == "nested":
+                self._buffer.append(char)
+                if self._in_string:
+                    self._scan_string(char)
+                elif char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._complete_value("".join(self._buffer), completed)
+            elif state == "scalar":
+                if char in ",}" or char in WHITESPACE:
+                    self._complete_value("".join(self._buffer), completed)
+                    if char == "}":
+                        self._state, self.done = "end", True
+                else:
+                    self._buffer.append(char)
+        return completed
+
+def salvage_fields(text: str) -> dict:
+    """Top-level fields of a JSON object reply that completed before it broke off or went invalid"""
+    parser = JsonFieldStream()
+    parser.feed(text)
+    return parser.fields
@@ -0,0 +1,171 @@
+import ast
+import os
+import re
+
+from libs import lib_names, private_libs
+from structured_outputs import Lib
+
+LIB_DETECTOR_MIN_CONFIDENCE = float(os.getenv("LIB_DETECTOR_MIN_CONFIDENCE", "0.75"))
+
+KNOWN_LIBS = set(lib_names) | set(private_libs)
+
+# Conventional import aliases, only used when the code itself doesn't say
+COMMON_ALIASES = {"np": "numpy", "pd": "pandas", "plt": "matplotlib", "mpl": "matplotlib"}
+
+# Confidence of each kind of evidence
+IMPORT_CONFIDENCE = 1.0
+NAME_CONFIDENCE = 0.8
+ALIAS_CONFIDENCE = 0.5
+WORD_CONFIDENCE = 0.4
+
+# Library names that are also everyday words: "handle incoming requests in flask" may mean
+# neither library, so a bare mention only counts next to an install, import or dotted use
+COMMON_WORD_LIBS = {"requests", "flask"}
+EXPLICIT_MENTION = r"(?:pip install|import)\s+{lib}\b|\b{lib}\.\w|`{lib}`"
+
+IMPORT_RE = re.compile(r"^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w.]+))", re.MULTILINE)
+FENCE_RE = re.compile(r"```[\w+-]*\n(.*?)```", re.DOTALL)
+
+def split_query(query: str) -> tuple:
+    """Splits a query into (prompt text, code), understanding the frontend's `code:`/`prompt:` layout and fences"""
+    if query.startswith("code:\n") and "\n\nprompt:\n" in query:
+        code, text = query[len("code:\n"):].rsplit("\n\nprompt:\n", 1)
+        return text, code
+
+    blocks = FENCE_RE.findall(query)
+    if blocks:
+        return FENCE_RE.sub(" ", query), "\n".join(blocks)
+
+    return query, ""
+
+class _UsageVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.aliases = {}
+        self.imported = set()
+        self.attributes = {}
+
+    def _add_import(self, module: str, alias: str):
+        root = module.split(".")[0].lower()
+        self.imported.add(root)
+        self.aliases[alias] = root
+
+    def visit_Import(self, node):
+        for name in node.names:
+            self._add_import(name.name, name.asname or name.name.split(".")[0])
+
+    def visit_ImportFrom(self, node):
+        if node.module and node.level == 0:
+            root = node.module.split(".")[0].lower()
+            self.imported.add(root)
+            for name in node.names:
+                self.aliases[name.asname or name.name] = root
+                self.attributes.setdefault(root, []).append(name.name)
+
+    def visit_Attribute(self, node):
+        base = node
+        while isinstance(base, ast.Attribute):
+            base = base.value
+        if isinstance(base, ast.Name):
+            self.attributes.setdefault(base.id, []).append(node.attr)
+        self.generic_visit(node)
+
+def _python_usage(code: str) -> tuple:
+    """Returns ({lib: confidence}, {lib: [used attributes]}) for the code, or None if it isn't Python"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+
+    visitor = _UsageVisitor()
+    visitor.visit(tree)
+
+    found, usage = {}, {}
+    for lib in visitor.imported & KNOWN_LIBS:
+        found[lib] = IMPORT_CONFIDENCE
+
+    for name, attributes in visitor.attributes.items():
+        lib = visitor.aliases.get(name) or (name.lower() if name.lower() in KNOWN_LIBS else None)
+        if lib is None and name in COMMON_ALIASES:
+            lib = COMMON_ALIASES[name]
+            found.setdefault(lib, ALIAS_CONFIDENCE)
+        if lib in KNOWN_LIBS:
+            found.setdefault(lib, NAME_CONFIDENCE)
+            usage.setdefault(lib, []).extend(attributes)
+
+    return found, usage
+
+def _text_mentions(text: str) -> dict:
+    lowered = text.lower()
+    words = set(re.findall(r"[a-z_][a-z0-9_]*", lowered))
+    found = {}
+    for lib in KNOWN_LIBS & words:
+        explicit = lib not in COMMON_WORD_LIBS or re.search(EXPLICIT_MENTION.format(lib=re.escape(lib)), lowered)
+        found[lib] = NAME_CONFIDENCE if explicit else WORD_CONFIDENCE
+    for alias, lib in COMMON_ALIASES.items():
+        if alias in words:
+            found.setdefault(lib, ALIAS_CONFIDENCE)
+    return found
+
+def _search_sentence(text: str, attributes: list) -> str:
+    words = re.sub(r"[^\w\s.-]", " ", text).split()[:15]
+    sentence = " ".join(words)
+    unique = list(dict.fromkeys(attributes))[:6]
+    if unique:
+        sentence = f"{sentence} using {', '.join(unique)}".strip()
+    return sentence or "core usage examples"
+
+def detect_libs(query: str) -> tuple:
+    """
+        Finds the libraries of a query without calling the LLM.
+
+        Python code is parsed with `ast` for imports and attribute usage; import
+        statements are also matched textually for other languages, and the prompt
+        text is matched against `lib_names` and `private_libs`. Returns a `Lib` in
+        the extractor's `lib_name: search sentence` format and the confidence of
+        the weakest library found (0.0 when nothing was found).
+    """
+    text, code = split_query(query)
+
+    found, usage = {}, {}
+    parsed = _python_usage(code or query)
+    if parsed is not None:
+        found, usage = parsed
+    elif code:
+        for match in IMPORT_RE.finditer(code):
+            lib = (match.group(1) or match.group(2)).split(".")[0].lower()
+            if lib in KNOWN_LIBS:
+                found[lib] = IMPORT_CONFIDENCE
+
+    for lib, confidence in _text_mentions(text).items():
+        found[lib] = max(found.get(lib, 0.0), confidence)
+
+    entries = [f"{lib}: {_search_sentence(text, usage.get(lib, []))}" for lib in sorted(found)]
+    confidence = min(found.values()) if found else 0.0
+
+    return Lib(lib=entries), confidence
+
+class LibDetector:
+    """Uses `detect_libs` first and the LLM extractor only when it is empty or unsure"""
+
+    def __init__(self, extractor, min_confidence: float = LIB_DETECTOR_MIN_CONFIDENCE):
+        self.extractor = extractor
+        self.min_confidence = min_confidence
+        self.local_hits = 0
+        self.llm_calls = 0
+
+    async def extract(self, query: str) -> Lib:
+        libs, confidence = detect_libs(query)
+        if libs.lib and confidence >= self.min_confidence:
+            self.local_hits += 1
+            return libs
+
+        self.llm_calls += 1
+        return await self.extractor.ainvoke(query)
+
+    def stats(self) -> dict:
+        total = self.local_hits + self.llm_calls
+        return {
+            "local": self.local_hits,
+            "llm": self.llm_calls,
+            "llm_calls_avoided": round(self.local_hits / total, 4) if total else 0.0
+        }
@@ -1,6 +1,13 @@
-import requests
+import asyncio
+import time
+import httpx
+from functools import lru_cache
 from urllib.parse import quote_plus
 from libs import libs
+from docs_cache import DocsCache, normalize_topic
+from cache import TTLCache
+from http_client import http_client
+from local_index import LocalSnippetIndex
 from langchain_core.tools import tool
 
 from pinecone import Pinecone, ServerlessSpec
@@ -9,23 +16,52 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def _get_docs(base_url: str, topic: str, tokens: int = 5_000) -> str:
+# Limits for running the tool calls of a single LLM turn concurrently
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "8"))
+TOOL_CONCURRENCY_PER_TOOL = {
+    "scrap_docs": int(os.getenv("SCRAP_DOCS_CONCURRENCY", "4")),
+    "scrap_snippets": int(os.getenv("SCRAP_SNIPPETS_CONCURRENCY", "4")),
+}
+
+# Context7 responses keyed by (base_url, normalized topic, tokens)
+docs_cache = DocsCache()
+
+DOCS_TOKENS = 5_000
+
+def docs_cache_keys(tool_calls: list) -> set:
+    """Docs cache keys read by the scrap_docs calls among `tool_calls`"""
+    return {
+        docs_cache.key(libs[tool_call['args']['lib_name']], tool_call['args']['topic'], DOCS_TOKENS)
+        for tool_call in tool_calls
+        if tool_call['name'] == 'scrap_docs' and tool_call['args'].get('lib_name') in libs
+    }
+
+async def _get_docs(base_url: str, topic: str, tokens: int = DOCS_TOKENS) -> str:
+
+    cache_key = docs_cache.key(base_url, topic, tokens)
+    cached = await docs_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
     topic = quote_plus(topic)
 
     url = f"{base_url}/llms.txt?topic={topic}&tokens={tokens}"
 
-    response = requests.get(url)
+    try:
+        response = await http_client.get(url)
+    except httpx.HTTPError as e:
+        return f"Failed to fetch data. Error: {type(e).__name__}"
 
     if response.status_code == 200:
         llms_text_data = response.text
+        await docs_cache.set(cache_key, llms_text_data)
     else:
         llms_text_data = f"Failed to fetch data. Status code: {response.status_code}"
 
     return llms_text_data
 
 @tool
-def scrap_docs(lib_name: str, topic: str) -> str:
+async def scrap_docs(lib_name: str, topic: str) -> str:
     """
     Retrieves relevant documentation for a Python library from an external documentation source.
     
@@ -54,46 +90,89 @@ def scrap_docs(lib_name: str, topic: str) -> str:
         str: Formatted documentation content relevant to the specified topic
     """
 
-    return _get_docs(libs[lib_name], topic)
+    return await _get_docs(libs[lib_name], topic)
+
+SNIPPETS_TOP_K = int(os.getenv("SNIPPETS_TOP_K", "5"))
+SNIPPETS_CACHE_TTL = float(os.getenv("SNIPPETS_CACHE_TTL", "3600"))
+SNIPPETS_CACHE_MAX_ENTRIES = int(os.getenv("SNIPPETS_CACHE_MAX_ENTRIES", "1024"))
 
-def _get_snippets(lib_name: str, topic: str):
+# Namespaces served from the in-process index instead of Pinecone, e.g. "project_demo"
+LOCAL_SNIPPET_NAMESPACES = {ns.strip() for ns in os.getenv("LOCAL_SNIPPET_NAMESPACES", "").split(",") if ns.strip()}
+# Whether a local namespace that is missing on disk may be served by Pinecone instead
+SNIPPETS_REMOTE_FALLBACK = os.getenv("SNIPPETS_REMOTE_FALLBACK", "false").lower() == "true"
 
+local_snippet_index = LocalSnippetIndex()
+
+# Formatted search results keyed by (namespace, normalized topic, top_k)
+snippets_cache = TTLCache(maxsize=SNIPPETS_CACHE_MAX_ENTRIES, ttl=SNIPPETS_CACHE_TTL)
+
+SNIPPET_TEMPLATE = (
+    "TITLE: {TITLE}\n"
+    "DESCRIPTION: {text}\n"
+    "LANGUAGE: {LANGUAGE}\n"
+    "SOURCE: {SOURCE}\n"
+    "CODE: ```\n{CODE}\n```\n"
+    "----------------------\n"
+)
+
+@lru_cache(maxsize=1)
+def _pinecone_index():
+    # Built once per process, the client keeps its connection pool between searches
     pinecone_key = os.getenv('PINECONE_KEY')
     pc = Pinecone(api_key=pinecone_key)
 
-    index = pc.Index("first-index")
+    return pc.Index("first-index")
 
-    results = index.search(
+def _remote_hits(lib_name: str, topic: str, top_k: int) -> list:
+    results = _pinecone_index().search(
         namespace=lib_name,
         query={
-            "top_k": 5,
+            "top_k": top_k,
             "inputs": {
                 'text': topic
             }
         }
     )
 
-    key_words = ['TITLE', 'text', 'LANGUAGE', 'SOURCE', 'CODE']
+    return results['result']['hits']
+
+def _local_hits(lib_name: str, topic: str, top_k: int):
+    """Hits from the local index, or None when the namespace isn't on disk and there is no remote fallback"""
+    if local_snippet_index.has_namespace(lib_name):
+        return local_snippet_index.search(lib_name, topic, top_k)
+    if SNIPPETS_REMOTE_FALLBACK:
+        return _remote_hits(lib_name, topic, top_k)
+    return None
+
+def _search_hits(lib_name: str, topic: str, top_k: int) -> list:
+    if lib_name in LOCAL_SNIPPET_NAMESPACES:
+        return _local_hits(lib_name, topic, top_k)
+    return _remote_hits(lib_name, topic, top_k)
+
+def _format_hits(hits: list) -> str:
+    return "".join(SNIPPET_TEMPLATE.format(**hit['fields']) for hit in hits)
 
-    context = ""
+def _get_snippets(lib_name: str, topic: str, top_k: int = SNIPPETS_TOP_K):
 
-    for res in results['result']['hits']:
-        fields = res['fields']
-        temp = ""
-        temp += key_words[0] + ': ' +fields[key_words[0]] + '\n'
-        temp += "DESCRIPTION" + ': ' +fields[key_words[1]] + '\n'
-        temp += key_words[2] + ': ' +fields[key_words[2]] + '\n'
-        temp += key_words[3] + ': ' +fields[key_words[3]] + '\n'
-        temp += key_words[4] + ': ' + f"```\n{fields[key_words[4]]}\n```" + '\n'
+    cache_key = (lib_name, normalize_topic(topic), top_k)
+    cached = snippets_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-        context += temp + '----------------------\n'
+    hits = _search_hits(lib_name, topic, top_k)
+    if hits is None:
+        # Not cached, so the namespace is picked up as soon as it is exported
+        return f"No snippets available: {lib_name} is not indexed locally."
+
+    context = _format_hits(hits)
+    snippets_cache.set(cache_key, context)
 
     return context
 
 
 
 @tool
-def scrap_snippets(lib_name: str, topic: str) -> str:
+async def scrap_snippets(lib_name: str, topic: str) -> str:
     """
         Uses _get_snippets function to scrap documentation from pinecone database, if code is provided
         use this code to reason about what the user want, the topic should be something related to the code
@@ -109,4 +188,58 @@ def scrap_snippets(lib_name: str, topic: str) -> str:
             topic: topic of interets in the library to get more accurate and useful docs for out use case
     """
 
-    return _get_snippets(lib_name, topic)
\ No newline at end of file
+    # The Pinecone client is synchronous, keep it off the event loop
+    try:
+        return await asyncio.to_thread(_get_snippets, lib_name, topic)
+    except Exception as e:
+        # Like a failed docs fetch, a failed search is reported to the LLM instead of failing the query
+        return f"Failed to search snippets. Error: {type(e).__name__}"
+
+async def run_tool_calls(tool_calls: list, tools_registry: dict,
+                         max_concurrency: int = None, per_tool_limits: dict = None,
+                         on_start=None, on_finish=None):
+    """
+        Runs the tool calls of one LLM turn concurrently.
+
+        At most `max_concurrency` calls run at once overall, and at most
+        `per_tool_limits[name]` for a given tool. The returned tool messages keep
+        the order of `tool_calls`, so the transcript is the same as when the calls
+        ran one after another. Also returns the latency of every call.
+
+        `on_start(tool_call)` and `on_finish(latency)` are optional coroutines
+        called around every call, in completion order.
+    """
+
+    max_concurrency = max_concurrency or TOOL_CONCURRENCY
+    per_tool_limits = per_tool_limits or TOOL_CONCURRENCY_PER_TOOL
+
+    overall = asyncio.Semaphore(max_concurrency)
+    per_tool = {
+        name: asyncio.Semaphore(per_tool_limits.get(name, max_concurrency))
+        for name in tools_registry
+    }
+
+    async def run_one(tool_call):
+        name = tool_call['name']
+        selected_tool = tools_registry[name]
+        async with per_tool[name], overall:
+            if on_start:
+                await on_start(tool_call)
+            start = time.perf_counter()
+            tool_msg = await selected_tool.ainvoke(tool_call)
+            latency = {
+                "id": tool_call['id'],
+                "name": name,
+                "args": tool_call['args'],
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2)
+            }
+        if on_finish:
+            await on_finish(latency)
+        return tool_msg, latency
+
+    results = await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls))
+
+    tool_messages = [tool_msg for tool_msg, _ in results]
+    latencies = [latency for _, latency in results]
+
+    return tool_messages, latencies
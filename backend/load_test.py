@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Fires concurrent requests at a running backend and reports whether they
+overlap. With a blocking pipeline the wall time is close to the sum of the
+individual latencies and /health stalls behind the queries; with the async
+pipeline the requests run side by side.
+
+    uvicorn main:app --port 8000
+    python load_test.py --url http://127.0.0.1:8000 --concurrency 5
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+QUERY = {
+    "query": "prompt:\nhow do I paginate results with fastapi and pandas",
+    "system_prompt": "you are a smart coding assistant"
+}
+
+async def timed_request(client: httpx.AsyncClient, method: str, path: str, t0: float, **kwargs) -> dict:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    end = time.perf_counter()
+    return {"path": path, "status": status, "start": start - t0, "end": end - t0, "latency": end - start}
+
+async def run(url: str, concurrency: int, health_probes: int, timeout: float):
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        t0 = time.perf_counter()
+        queries = [
+            timed_request(client, "POST", "/execute-query", t0, json=QUERY)
+            for _ in range(concurrency)
+        ]
+
+        async def probe_health():
+            results = []
+            for _ in range(health_probes):
+                await asyncio.sleep(0.5)
+                results.append(await timed_request(client, "GET", "/health", t0))
+            return results
+
+        *query_results, health_results = await asyncio.gather(*queries, probe_health())
+        wall = time.perf_counter() - t0
+
+    return query_results, health_results, wall
+
+def report(query_results: list, health_results: list, wall: float):
+    print("Load test results")
+    print("=" * 50)
+    for r in sorted(query_results, key=lambda r: r["start"]):
+        print(f"{r['path']:<16} {str(r['status']):<6} start={r['start']:6.2f}s end={r['end']:6.2f}s latency={r['latency']:6.2f}s")
+
+    total = sum(r["latency"] for r in query_results)
+    # 1.0 means fully serialized, N means all N requests ran at the same time
+    overlap = total / wall if wall else 0.0
+
+    print("=" * 50)
+    print(f"wall time:          {wall:.2f}s")
+    print(f"sum of latencies:   {total:.2f}s")
+    print(f"overlap factor:     {overlap:.2f}x (1.00x = serialized)")
+
+    if health_results:
+        worst = max(r["latency"] for r in health_results)
+        print(f"/health worst case: {worst * 1000:.1f}ms over {len(health_results)} probes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for /execute-query")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--health-probes", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    report(*asyncio.run(run(args.url, args.concurrency, args.health_probes, args.timeout)))
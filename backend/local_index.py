@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+from cache import TTLCache
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".index")
+LOCAL_INDEX_EMBED_MODEL = os.getenv("LOCAL_INDEX_EMBED_MODEL", "llama-text-embed-v2")
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def pinecone_embedder(model: str = LOCAL_INDEX_EMBED_MODEL):
+    """
+        Embeds queries with Pinecone inference, the same model the remote index
+        uses, so exported vectors and query vectors live in the same space.
+    """
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv('PINECONE_KEY'))
+
+    def embed(texts: list) -> np.ndarray:
+        result = pc.inference.embed(model=model, inputs=texts, parameters={"input_type": "query"})
+        return np.asarray([item["values"] for item in result], dtype=np.float32)
+
+    return embed
+
+class LocalSnippetIndex:
+    """
+        In-process vector index for small private libraries.
+
+        Each namespace is `<namespace>.npy` (float32 embeddings, L2-normalized
+        rows) plus `<namespace>.json` (the snippet fields, same order) in
+        `directory`. Matrices are memory-mapped on first use. Search is a single
+        matrix-vector product followed by `argpartition` for the top k, and hits
+        come back shaped like Pinecone search hits.
+
+        `embed(texts) -> np.ndarray` turns query text into vectors; query vectors
+        are cached because the same topics come back often.
+    """
+
+    def __init__(self, directory: str = LOCAL_INDEX_DIR, embed=None):
+        self.directory = directory
+        self._embed = embed
+        self._namespaces = {}
+        self._lock = threading.Lock()
+        self.query_cache = TTLCache(maxsize=2048, ttl=86400)
+
+    def _paths(self, namespace: str) -> tuple:
+        base = os.path.join(self.directory, namespace)
+        return f"{base}.npy", f"{base}.json"
+
+    def has_namespace(self, namespace: str) -> bool:
+        return all(os.path.exists(path) for path in self._paths(namespace))
+
+    def _load(self, namespace: str) -> tuple:
+        loaded = self._namespaces.get(namespace)
+        if loaded is None:
+            with self._lock:
+                loaded = self._namespaces.get(namespace)
+                if loaded is None:
+                    matrix_path, fields_path = self._paths(namespace)
+                    matrix = np.load(matrix_path, mmap_mode="r")
+                    with open(fields_path) as f:
+                        records = json.load(f)
+                    loaded = self._namespaces[namespace] = (matrix, records)
+        return loaded
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = self.query_cache.get(text)
+        if vector is None:
+            if self._embed is None:
+                self._embed = pinecone_embedder()
+            vector = _normalize(self._embed([text])[0].astype(np.float32))
+            self.query_cache.set(text, vector)
+        return vector
+
+    def search_vector(self, namespace: str, vector: np.ndarray, top_k: int = 5) -> list:
+        matrix, records = self._load(namespace)
+        if not records:
+            return []
+
+        scores = matrix @ vector
+        top_k = min(top_k, len(records))
+        if top_k < len(records):
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(records))
+        ranked = candidates[np.argsort(-scores[candidates])]
+
+        return [
+            {"_id": records[i]["_id"], "_score": float(scores[i]), "fields": records[i]["fields"]}
+            for i in ranked
+        ]
+
+    def search(self, namespace: str, topic: str, top_k: int = 5) -> list:
+        return self.search_vector(namespace, self.embed(topic), top_k)
+
+    def build_namespace(self, namespace: str, records: list, embeddings) -> None:
+        """Writes a namespace; `records` are {"_id", "fields"} dicts matching the embedding rows"""
+        matrix = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if len(matrix) != len(records):
+            raise ValueError("records and embeddings must have the same length")
+
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path, fields_path = self._paths(namespace)
+        np.save(matrix_path, matrix)
+        with open(fields_path, "w") as f:
+            json.dump(records, f)
+
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+
+def export_namespace(namespace: str, index_name: str = "first-index", directory: str = LOCAL_INDEX_DIR) -> int:
+    """Copies every record of a Pinecone namespace (vectors and fields) into the local index"""
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv('PINECONE_KEY'))
+    index = pc.Index(index_name)
+
+    records, embeddings = [], []
+    for ids in index.list(namespace=namespace):
+        fetched = index.fetch(ids=list(ids), namespace=namespace)
+        for vector_id, vector in fetched.vectors.items():
+            records.append({"_id": vector_id, "fields": dict(vector.metadata or {})})
+            embeddings.append(vector.values)
+
+    LocalSnippetIndex(directory).build_namespace(namespace, records, embeddings)
+    return len(records)
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Export Pinecone namespaces to the local snippet index")
+    parser.add_argument("namespaces", nargs="+")
+    parser.add_argument("--index", default="first-index")
+    parser.add_argument("--dir", default=LOCAL_INDEX_DIR)
+    args = parser.parse_args()
+
+    for namespace in args.namespaces:
+        count = export_namespace(namespace, args.index, args.dir)
+        print(f"{namespace}: {count} snippets written to {args.dir}")
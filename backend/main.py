@@ -1,6 +1,6 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import google.generativeai as genai
@@ -8,26 +8,49 @@ import os
 from datetime import datetime
 import uuid
 import json
+import asyncio
+import time
+import logging
+from collections import Counter, defaultdict
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from langchain.chat_models import init_chat_model
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
 
 from structured_outputs import Lib, CodeTextSep
-from llm_tools import scrap_docs, scrap_snippets
+from llm_tools import scrap_docs, scrap_snippets, run_tool_calls, docs_cache, snippets_cache, docs_cache_keys
+from http_client import http_client
 from models.api_models import CodeRequest, ChatMessage, Chat, CodeResponse, ChatResponse, QueryRequest
 from fastapi.middleware.cors import CORSMiddleware
-from postgres_api import postgres_router
+from postgres_api import postgres_router, db_pool
+from conversation_memory import ConversationMemory, summary_prompt
+from semantic_cache import SemanticCache, SEMANTIC_CACHE_ENABLED, code_key
+from lib_detector import LibDetector
+from context_assembler import ContextAssembler
+from analysis_cache import AnalysisCache, analysis_cache_key
+from incremental_analysis import analyze_incrementally, largest_unit_prompt_tokens
+from chunked_analysis import analyze_in_chunks, SubmissionTooLarge, ANALYZE_CHUNKED_ABOVE_TOKENS, ANALYZE_CHUNK_MAX_PROMPT_TOKENS
+from tokens import count_tokens
+from json_stream import JsonFieldStream, salvage_fields
+from chat_store import create_chat_store
 
 load_dotenv()
 
-# Database models (using in-memory storage for simplicity)
-# In production, use PostgreSQL, MongoDB, etc.
-chats_db = {}
-messages_db = {}
+logger = logging.getLogger(__name__)
+
+# Analysis results by content hash, in memory and in the analysis_cache table
+analysis_cache = AnalysisCache()
+
+# Parallel LLM calls per /api/analyze/batch request
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "8"))
+ANALYZE_BATCH_MAX_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_MAX_CONCURRENCY", "32"))
+
+# Chats and messages, in memory by default or in PostgreSQL with CHAT_STORE=postgres
+chat_store = create_chat_store()
 
 # Pydantic models imported from models.api_models
 
@@ -40,10 +63,27 @@ def llm_hints(kind: str, libs: dict):
     
     return public_prompt
 
-llm = init_chat_model("gpt-4.1", model_provider="openai")
+LLM_MODEL = "gpt-4.1"
+
+llm = init_chat_model(LLM_MODEL, model_provider="openai")
 lib_extractor_llm = llm.with_structured_output(Lib)
+# Detects libraries locally and only asks lib_extractor_llm when unsure
+lib_detector = LibDetector(lib_extractor_llm)
+embeddings = OpenAIEmbeddings(model=os.getenv("SEMANTIC_CACHE_EMBED_MODEL", "text-embedding-3-small"))
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await asyncio.to_thread(db_pool.open)
+        logger.info("database pool opened with %d connections", db_pool.min_size)
+    except Exception as e:
+        # The in-memory endpoints still work; the pool opens on first use once postgres is up
+        logger.warning("could not open the database pool: %s", e)
+    yield
+    await http_client.aclose()
+    db_pool.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,74 +96,215 @@ app.add_middleware(
 # Include PostgreSQL database router
 app.include_router(postgres_router)
 
-memory = []
+async def summarize_turns(previous_summary: str, dropped: list) -> str:
+    response = await llm.ainvoke(summary_prompt(previous_summary, dropped))
+    return response.content
 
-@app.post("/execute-query")
-async def execute_query(request: QueryRequest):
-    query = request.query
-    system_prompt = request.system_prompt
+# Per-chat conversation history, bounded by MEMORY_TOKEN_BUDGET tokens per prompt
+conversation_memory = ConversationMemory(
+    summarizer=summarize_turns if os.getenv("MEMORY_SUMMARIZE", "false").lower() == "true" else None
+)
+conversation_memory.prompt_hooks.append(
+    lambda session_id, stats: logger.debug("memory chat=%s %s", session_id, stats)
+)
 
-    try:
-        def execute_llm(llm, query: str, system_promt: str):
-            tools_registry = {
-                "scrap_docs": scrap_docs,
-                "scrap_snippets": scrap_snippets
+async def embed_query(text: str) -> list:
+    return await embeddings.aembed_query(text)
+
+# Fits retrieved docs and snippets into CONTEXT_TOKEN_BUDGET before the final answer call
+context_assembler = ContextAssembler(model=LLM_MODEL)
+
+# Whole-pipeline answers for first questions of a chat, matched by embedding similarity
+semantic_cache = SemanticCache(embed_query)
+docs_cache.refresh_listeners.append(semantic_cache.invalidate_dependency)
+
+async def execute_llm(llm, query: str, system_promt: str, emit=None, chat_id: str = None) -> dict:
+    """
+        Runs the lib extraction -> tool planning -> retrieval -> answer pipeline.
+
+        `emit(event, data)` is an optional coroutine called as the pipeline
+        progresses; when it is given the final answer is streamed token by token.
+        History is kept per `chat_id` in `conversation_memory`. The first question
+        of a chat is answered from `semantic_cache` when a similar one was seen.
+    """
+    started = time.perf_counter()
+
+    tools_registry = {
+        "scrap_docs": scrap_docs,
+        "scrap_snippets": scrap_snippets
+    }
+
+    tools = [scrap_docs, scrap_snippets]
+    llm_with_tools = llm.bind_tools(tools)
+
+    messages = [
+        SystemMessage(system_promt),
+        HumanMessage(query),
+    ]
+
+    turn = [HumanMessage(query)]
+
+    # Follow-up questions depend on the chat history, only first questions are cached
+    use_cache = SEMANTIC_CACHE_ENABLED and not conversation_memory.has_history(chat_id)
+    cache_info = {"hit": False}
+
+    if use_cache:
+        query_vector = await semantic_cache.vector(system_promt, query)
+        query_code = code_key(query)
+        entry, similarity = semantic_cache.lookup(query_vector, query_code)
+        cache_info["similarity"] = round(similarity, 4)
+
+        if entry is not None:
+            cache_info["hit"] = True
+            output = AIMessage(entry.answer)
+            if emit:
+                await emit("libs", entry.payload["libs"])
+                await emit("token", {"content": entry.answer})
+            conversation_memory.add_turn(chat_id, turn + [output])
+            return {
+                "result": output,
+                "full_messages": messages + [output],
+                "tool_calls": entry.payload["tool_calls"],
+                "tool_latencies": [],
+                "memory": None,
+                "context": None,
+                "cache": cache_info
             }
-    
-            tools = [scrap_docs, scrap_snippets]
-            llm_with_tools = llm.bind_tools(tools)
 
-            messages = [
-                SystemMessage(system_promt),
-                HumanMessage(query),
-            ]
+    useful_libs = await lib_detector.extract(query)
+    public_libs = useful_libs.to_dict_public()
+    private_libs = useful_libs.to_dict_private()
 
-            memory.extend(messages)
-    
-            useful_libs = lib_extractor_llm.invoke(query)
-            public_libs = useful_libs.to_dict_public()
-            private_libs = useful_libs.to_dict_private()
+    if emit:
+        await emit("libs", {"public": public_libs, "private": private_libs})
 
-            public_prompt = llm_hints("public", public_libs)
-            private_prompt = llm_hints("private", private_libs)
+    public_prompt = llm_hints("public", public_libs)
+    private_prompt = llm_hints("private", private_libs)
 
-            libs_text = f"{public_prompt}\n\n{private_prompt}"
-    
-            next_prompt = f"get the docs and search for the topics of the following libraries\n{libs_text}"
-    
-            ai_message = llm_with_tools.invoke(next_prompt)
-            messages.append(ai_message)
-            memory.append(ai_message)
+    libs_text = f"{public_prompt}\n\n{private_prompt}"
 
-            tool_calls = ai_message.tool_calls
-    
-            for tool_call in tool_calls:
-                selected_tool = tools_registry[tool_call['name']]
-                tool_msg = selected_tool.invoke(tool_call)
-                messages.append(tool_msg)
-                memory.append(tool_msg)
-    
-            output = llm_with_tools.invoke(memory)
+    next_prompt = f"get the docs and search for the topics of the following libraries\n{libs_text}"
 
-            print(memory)
+    ai_message = await llm_with_tools.ainvoke(next_prompt)
+    messages.append(ai_message)
+    turn.append(ai_message)
 
-            return (output, messages, tool_calls)
-        
-        result, full_messages, tool_calls = execute_llm(llm, query, system_prompt)
-        return {"result": result, "full_messages": full_messages, "tool_calls": tool_calls}
+    tool_calls = ai_message.tool_calls
+
+    tool_messages, tool_latencies = await run_tool_calls(
+        tool_calls,
+        tools_registry,
+        on_start=(lambda tool_call: emit("tool_start", tool_call)) if emit else None,
+        on_finish=(lambda latency: emit("tool_end", latency)) if emit else None
+    )
+    # Counting tokens of tens of thousands of docs tokens is CPU work, keep it off the event loop
+    tool_messages, context_stats = await asyncio.to_thread(context_assembler.assemble, query, tool_calls, tool_messages)
+    logger.debug("context %s", context_stats)
+    messages.extend(tool_messages)
+    turn.extend(tool_messages)
+
+    prompt, memory_stats = await conversation_memory.build_prompt(chat_id, system_promt, turn)
+
+    if emit:
+        output = None
+        async for chunk in llm_with_tools.astream(prompt):
+            output = chunk if output is None else output + chunk
+            if chunk.content:
+                await emit("token", {"content": chunk.content})
+    else:
+        output = await llm_with_tools.ainvoke(prompt)
+
+    conversation_memory.add_turn(chat_id, turn + [output])
+
+    if use_cache and output is not None and output.content:
+        semantic_cache.store(
+            query_vector,
+            output.content,
+            payload={"libs": {"public": public_libs, "private": private_libs}, "tool_calls": tool_calls},
+            dependencies=docs_cache_keys(tool_calls),
+            latency=time.perf_counter() - started,
+            code=query_code
+        )
+
+    return {
+        "result": output,
+        "full_messages": messages,
+        "tool_calls": tool_calls,
+        "tool_latencies": tool_latencies,
+        "memory": memory_stats,
+        "context": context_stats,
+        "cache": cache_info
+    }
+
+@app.post("/execute-query")
+async def execute_query(request: QueryRequest):
+    query = request.query
+    system_prompt = request.system_prompt
+    chat_id = request.chat_id or str(uuid.uuid4())
+
+    try:
+        result = await execute_llm(llm, query, system_prompt, chat_id=chat_id)
+        return {"chat_id": chat_id, **result}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/execute-query/stream")
+async def execute_query_stream(request: QueryRequest):
+    """Same pipeline as /execute-query, sent as server-sent events while it runs"""
+    chat_id = request.chat_id or str(uuid.uuid4())
+    queue = asyncio.Queue()
+    done = object()
+
+    async def emit(event: str, data):
+        await queue.put(sse_event(event, data))
+
+    async def run():
+        try:
+            result = await execute_llm(llm, request.query, request.system_prompt, emit, chat_id)
+            output = result["result"]
+            await emit("done", {
+                "chat_id": chat_id,
+                "result": output.content if output is not None else "",
+                "tool_calls": result["tool_calls"],
+                "tool_latencies": result["tool_latencies"],
+                "memory": result["memory"],
+                "context": result["context"],
+                "cache": result["cache"]
+            })
+        except Exception as e:
+            await emit("error", {"detail": str(e)})
+        finally:
+            await queue.put(done)
+
+    async def event_stream():
+        task = asyncio.create_task(run())
+        try:
+            while (item := await queue.get()) is not done:
+                yield item
+        finally:
+            # Client went away before the pipeline finished
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 def create_analysis_prompt(code: str, language: str, context: str) -> str:
     return f"""
     You are an expert code analyst. Analyze the following {language} code and provide:
     
     1. CORRECTED_CODE: Improved version of the code with best practices
     2. EXPLANATION: Clear explanation of what the code does and improvements made
-    3. VISUALIZATION_HTML: HTML/CSS visualization that represents the code's functionality, data structures, or algorithm flow
-    4. SUGGESTIONS: List of specific improvement suggestions
-    5. WARNINGS: List of potential issues or performance concerns
+    3. SUGGESTIONS: List of specific improvement suggestions
+    4. WARNINGS: List of potential issues or performance concerns
+    5. VISUALIZATION_HTML: HTML/CSS visualization that represents the code's functionality, data structures, or algorithm flow
     
     Context: {context}
     
@@ -132,38 +313,113 @@ def create_analysis_prompt(code: str, language: str, context: str) -> str:
     {code}
     ```
     
-    Please format your response as JSON with the following structure:
+    Please format your response as JSON with the following structure, fields in this order:
     {{
         "corrected_code": "improved code here",
         "explanation": "detailed explanation here",
-        "visualization_html": "complete HTML with embedded CSS for visualization",
         "suggestions": ["suggestion 1", "suggestion 2", ...],
-        "warnings": ["warning 1", "warning 2", ...]
+        "warnings": ["warning 1", "warning 2", ...],
+        "visualization_html": "complete HTML with embedded CSS for visualization"
     }}
     """
 
-async def analyze_code_with_gemini(code: str, language: str, context: str) -> CodeResponse:
+# Streamed in this order, so the corrected code arrives before the long visualization
+ANALYSIS_FIELDS = ["corrected_code", "explanation", "suggestions", "warnings", "visualization_html"]
+
+def analysis_fallback(code: str, text: str, fields: dict) -> dict:
+    """A complete result from the fields salvaged out of a broken reply, defaults for the rest"""
+    defaults = {
+        "corrected_code": code,
+        "explanation": text if not fields else "",
+        "suggestions": [],
+        "warnings": [],
+        "visualization_html": "<div>Visualization not available</div>"
+    }
+    return {
+        name: fields[name] if isinstance(fields.get(name), type(default)) else default
+        for name, default in defaults.items()
+    }
+
+async def analyze_code_with_gemini(code: str, language: str, context: str, bypass_cache: bool = False) -> CodeResponse:
     try:
+        cache_key = analysis_cache_key(code, language, context, LLM_MODEL)
+        if not bypass_cache:
+            cached = await analysis_cache.get(cache_key)
+            if cached is not None:
+                return CodeResponse(**cached)
+
         prompt = create_analysis_prompt(code, language, context)
-        response = llm.invoke(prompt)
+        response = await llm.ainvoke(prompt)
         
         # Parse JSON response
         try:
             result = json.loads(response.text)
+            # Only complete analyses are cached, the fallback below is not
+            await analysis_cache.set(cache_key, code, CodeResponse(**result).dict())
         except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            result = {
-                "corrected_code": code,
-                "explanation": response.text,
-                "visualization_html": "<div>Visualization not available</div>",
-                "suggestions": [],
-                "warnings": []
-            }
+            # Keep the fields that completed before the reply broke off
+            result = analysis_fallback(code, response.text, salvage_fields(response.text))
         
         return CodeResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing code: {str(e)}")
 
+# Running totals of the incremental and chunked analyses, served on /metrics/analysis
+analysis_mode_stats = defaultdict(Counter)
+
+def record_analysis_stats(mode: str, stats: dict):
+    logger.debug("%s analysis %s", mode, stats)
+    totals = analysis_mode_stats[mode]
+    totals["analyses"] += 1
+    for name, value in stats.items():
+        # max_prompt_tokens is a per-analysis peak, keep the largest seen
+        if name == "max_prompt_tokens":
+            totals[name] = max(totals[name], value)
+        elif isinstance(value, (int, float)):
+            totals[name] += value
+
+async def analyze_code_incrementally(code: str, language: str, context: str, bypass_cache: bool = False) -> CodeResponse:
+    """Like analyze_code_with_gemini, but only the top-level units not seen before go to the LLM"""
+    try:
+        result, stats = await analyze_incrementally(llm, analysis_cache, LLM_MODEL, code, language, context, bypass_cache)
+        record_analysis_stats("incremental", stats)
+        return CodeResponse(**result)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing code: {str(e)}")
+
+async def analyze_code_in_chunks(code: str, language: str, context: str, bypass_cache: bool = False) -> CodeResponse:
+    """Map-reduce analysis for submissions too large for one prompt"""
+    try:
+        result, stats = await analyze_in_chunks(llm, analysis_cache, LLM_MODEL, code, language, context, bypass_cache)
+        record_analysis_stats("chunked", stats)
+        return CodeResponse(**result)
+    except SubmissionTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing code: {str(e)}")
+
+def analysis_mode(request: CodeRequest) -> str:
+    """
+        "chunked", "incremental" or "whole". Size is checked first: large
+        submissions are chunked even with incremental=true, and so are incremental
+        ones with a unit whose prompt would go over the chunk prompt cap. Counts
+        tokens of the whole submission, so callers run it in a worker thread.
+    """
+    if request.chunked or count_tokens(request.code, LLM_MODEL) > ANALYZE_CHUNKED_ABOVE_TOKENS:
+        return "chunked"
+    if request.incremental:
+        largest = largest_unit_prompt_tokens(request.code, request.language, request.context, LLM_MODEL)
+        return "chunked" if largest > ANALYZE_CHUNK_MAX_PROMPT_TOKENS else "incremental"
+    return "whole"
+
+async def analyze_request(request: CodeRequest, mode: Optional[str] = None) -> CodeResponse:
+    analyze = {
+        "chunked": analyze_code_in_chunks,
+        "incremental": analyze_code_incrementally,
+        "whole": analyze_code_with_gemini
+    }[mode or await asyncio.to_thread(analysis_mode, request)]
+    return await analyze(request.code, request.language, request.context, request.bypass_cache)
+
 @app.get("/")
 async def root():
     return {"message": "Coding AI Agent API is running"}
@@ -172,6 +428,41 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Hit/miss counters of the retrieval caches"""
+    return {
+        "docs": docs_cache.stats(),
+        "snippets": snippets_cache.stats(),
+        "answers": semantic_cache.stats(),
+        "analysis": analysis_cache.stats()
+    }
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Size, checkouts and wait times of the database connection pool"""
+    return db_pool.stats()
+
+@app.get("/metrics/context")
+async def context_metrics():
+    """Tokens of retrieved docs before and after fitting them into the context budget"""
+    return context_assembler.stats()
+
+@app.get("/metrics/memory")
+async def memory_metrics():
+    """Prompt sizes and trimmed history of the conversation memory"""
+    return conversation_memory.stats()
+
+@app.get("/metrics/analysis")
+async def analysis_metrics():
+    """Units, chunks and prompt tokens of the incremental and chunked analyses"""
+    return {mode: dict(totals) for mode, totals in analysis_mode_stats.items()}
+
+@app.get("/metrics/lib-detector")
+async def lib_detector_metrics():
+    """How many library extractions were answered locally instead of by the LLM"""
+    return lib_detector.stats()
+
 @app.post("/api/chats", response_model=Chat)
 async def create_chat():
     """Create a new chat session"""
@@ -182,39 +473,53 @@ async def create_chat():
         created_at=datetime.now(),
         updated_at=datetime.now()
     )
-    chats_db[chat_id] = chat
+    await chat_store.add_chat(chat)
     return chat
 
 @app.get("/api/chats", response_model=List[Chat])
 async def get_chats():
     """Get all chat sessions"""
-    return list(chats_db.values())
+    return await chat_store.list_chats()
 
 @app.get("/api/chats/{chat_id}", response_model=Chat)
 async def get_chat(chat_id: str):
     """Get a specific chat session"""
-    if chat_id not in chats_db:
+    chat = await chat_store.get_chat(chat_id)
+    if chat is None:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    chat = chats_db[chat_id]
     # Add messages to chat
-    chat.messages = [msg for msg in messages_db.values() if msg.chat_id == chat_id]
-    return chat
+    return Chat(**chat.dict(exclude={"messages"}), messages=await chat_store.get_messages(chat_id))
 
 @app.delete("/api/chats/{chat_id}")
 async def delete_chat(chat_id: str):
     """Delete a chat session"""
-    if chat_id not in chats_db:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
     # Delete chat and its messages
-    del chats_db[chat_id]
-    messages_to_delete = [msg_id for msg_id, msg in messages_db.items() if msg.chat_id == chat_id]
-    for msg_id in messages_to_delete:
-        del messages_db[msg_id]
+    if not await chat_store.delete_chat(chat_id):
+        raise HTTPException(status_code=404, detail="Chat not found")
     
     return {"message": "Chat deleted successfully"}
 
+def analysis_user_message(request: CodeRequest, chat_id: str) -> ChatMessage:
+    return ChatMessage(
+        id=str(uuid.uuid4()),
+        chat_id=chat_id,
+        content=f"Analyze this {request.language} code: {request.code[:100]}...",
+        is_user=True,
+        timestamp=datetime.now(),
+        metadata={"code": request.code, "language": request.language, "context": request.context}
+    )
+
+def analysis_ai_message(ai_response: CodeResponse, chat_id: str) -> ChatMessage:
+    return ChatMessage(
+        id=str(uuid.uuid4()),
+        chat_id=chat_id,
+        content="I've analyzed your code and provided improvements, explanations, and visualizations.",
+        is_user=False,
+        timestamp=datetime.now(),
+        metadata=ai_response.dict()
+    )
+
 @app.post("/api/analyze", response_model=ChatResponse)
 async def analyze_code(request: CodeRequest):
     """Analyze code and return results"""
@@ -224,40 +529,22 @@ async def analyze_code(request: CodeRequest):
     if not chat_id:
         chat = await create_chat()
         chat_id = chat.id
-    elif chat_id not in chats_db:
+    elif not await chat_store.has_chat(chat_id):
         raise HTTPException(status_code=404, detail="Chat not found")
     
     # Create user message
-    user_msg_id = str(uuid.uuid4())
-    user_message = ChatMessage(
-        id=user_msg_id,
-        chat_id=chat_id,
-        content=f"Analyze this {request.language} code: {request.code[:100]}...",
-        is_user=True,
-        timestamp=datetime.now(),
-        metadata={"code": request.code, "language": request.language, "context": request.context}
-    )
-    messages_db[user_msg_id] = user_message
+    user_message = analysis_user_message(request, chat_id)
+    await chat_store.add_message(user_message)
     
     # Analyze code with Gemini
-    ai_response = await analyze_code_with_gemini(request.code, request.language, request.context)
+    ai_response = await analyze_request(request)
     
     # Create AI response message
-    ai_msg_id = str(uuid.uuid4())
-    ai_message = ChatMessage(
-        id=ai_msg_id,
-        chat_id=chat_id,
-        content="I've analyzed your code and provided improvements, explanations, and visualizations.",
-        is_user=False,
-        timestamp=datetime.now(),
-        metadata=ai_response.dict()
-    )
-    messages_db[ai_msg_id] = ai_message
+    ai_message = analysis_ai_message(ai_response, chat_id)
+    await chat_store.add_message(ai_message)
     
     # Update chat title and timestamp
-    if chat_id in chats_db:
-        chats_db[chat_id].title = f"Code Analysis - {request.language}"
-        chats_db[chat_id].updated_at = datetime.now()
+    await chat_store.update_chat(chat_id, title=f"Code Analysis - {request.language}", updated_at=datetime.now())
     
     return ChatResponse(
         chat_id=chat_id,
@@ -265,22 +552,188 @@ async def analyze_code(request: CodeRequest):
         ai_response=ai_response
     )
 
+async def stream_analysis(code: str, language: str, context: str, bypass_cache: bool, emit) -> tuple:
+    """
+        Like analyze_code_with_gemini, but the reply is streamed and every field is
+        sent as `emit("field", {"name", "value"})` as soon as it completes. Returns
+        (CodeResponse, complete); when the stream breaks off the fields that did
+        complete are kept and the rest get the fallback values.
+    """
+    cache_key = analysis_cache_key(code, language, context, LLM_MODEL)
+    if not bypass_cache:
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            for name in ANALYSIS_FIELDS:
+                await emit("field", {"name": name, "value": cached[name]})
+            return CodeResponse(**cached), True
+
+    parser = JsonFieldStream()
+    text = []
+    try:
+        async for chunk in llm.astream(create_analysis_prompt(code, language, context)):
+            piece = chunk.text
+            text.append(piece)
+            for name, value in parser.feed(piece):
+                if name in ANALYSIS_FIELDS:
+                    await emit("field", {"name": name, "value": value})
+    except Exception as e:
+        if not parser.fields:
+            raise HTTPException(status_code=500, detail=f"Error analyzing code: {str(e)}")
+        logger.warning("analysis stream broke off after %s: %s", list(parser.fields), e)
+
+    result = analysis_fallback(code, "".join(text), parser.fields)
+    complete = all(name in parser.fields and parser.fields[name] == result[name] for name in ANALYSIS_FIELDS)
+    if complete:
+        await analysis_cache.set(cache_key, code, result)
+    return CodeResponse(**result), complete
+
+@app.post("/api/analyze/stream")
+async def analyze_code_stream(request: CodeRequest):
+    """
+    Same as /api/analyze, sent as server-sent events while the model writes.
+
+    Each analysis field arrives as a `field` event once it is complete, corrected
+    code first and the visualization last; `done` carries the ChatResponse and
+    whether every field came from the model. Incremental and chunked analyses
+    are not streamed, their fields are sent together when they finish.
+    """
+    chat_id = request.chat_id
+    if chat_id and not await chat_store.has_chat(chat_id):
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    queue = asyncio.Queue()
+    done = object()
+
+    async def emit(event: str, data):
+        await queue.put(sse_event(event, data))
+
+    async def run():
+        nonlocal chat_id
+        try:
+            if not chat_id:
+                chat_id = (await create_chat()).id
+            await chat_store.add_message(analysis_user_message(request, chat_id))
+
+            mode = await asyncio.to_thread(analysis_mode, request)
+            if mode != "whole":
+                ai_response, complete = await analyze_request(request, mode), True
+                for name in ANALYSIS_FIELDS:
+                    await emit("field", {"name": name, "value": getattr(ai_response, name)})
+            else:
+                ai_response, complete = await stream_analysis(
+                    request.code, request.language, request.context, request.bypass_cache, emit
+                )
+
+            ai_message = analysis_ai_message(ai_response, chat_id)
+            await chat_store.add_message(ai_message)
+            await chat_store.update_chat(chat_id, title=f"Code Analysis - {request.language}", updated_at=datetime.now())
+
+            response = ChatResponse(chat_id=chat_id, message=ai_message, ai_response=ai_response)
+            await emit("done", {**json.loads(response.json()), "complete": complete})
+        except HTTPException as e:
+            await emit("error", {"detail": e.detail})
+        except Exception as e:
+            await emit("error", {"detail": str(e)})
+        finally:
+            await queue.put(done)
+
+    async def event_stream():
+        task = asyncio.create_task(run())
+        try:
+            while (item := await queue.get()) is not done:
+                yield item
+        finally:
+            # Client went away before the analysis finished
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/analyze/batch")
+async def analyze_code_batch(requests: List[CodeRequest], concurrency: Optional[int] = None):
+    """
+    Analyze many code submissions concurrently.
+
+    At most `concurrency` (default ANALYZE_BATCH_CONCURRENCY) analyses run at once.
+    Results are streamed as NDJSON lines in completion order, each tagged with its
+    `index` in the request; the chats and messages of the whole batch are written
+    in one transaction once every item has finished.
+    """
+    limit = max(1, min(concurrency or ANALYZE_BATCH_CONCURRENCY, ANALYZE_BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+
+    async def analyze_one(index: int, request: CodeRequest) -> dict:
+        chat_id = request.chat_id
+        if chat_id and not await chat_store.has_chat(chat_id):
+            return {"index": index, "chat_id": chat_id, "error": "Chat not found"}
+
+        async with semaphore:
+            try:
+                ai_response = await analyze_request(request)
+            except HTTPException as e:
+                return {"index": index, "chat_id": chat_id, "error": e.detail}
+
+        return {"index": index, "chat_id": chat_id or str(uuid.uuid4()), "ai_response": ai_response}
+
+    async def result_stream():
+        batch_chats, new_messages = {}, []
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(analyze_one(index, request)) for index, request in enumerate(requests)]
+
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                if "ai_response" in result:
+                    request = requests[result["index"]]
+                    chat_id = result["chat_id"]
+                    now = datetime.now()
+                    title = f"Code Analysis - {request.language}"
+                    # Existing chats only take the new title and updated_at
+                    batch_chats[chat_id] = Chat(id=chat_id, title=title, created_at=now, updated_at=now)
+
+                    user_message = analysis_user_message(request, chat_id)
+                    ai_message = analysis_ai_message(result["ai_response"], chat_id)
+                    new_messages.extend([user_message, ai_message])
+                    result["message_id"] = ai_message.id
+                    result["ai_response"] = result["ai_response"].dict()
+
+                yield json.dumps(result, default=str) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        await chat_store.save_batch(list(batch_chats.values()), new_messages)
+
+        yield json.dumps({
+            "done": True,
+            "items": len(requests),
+            "succeeded": len(new_messages) // 2,
+            "messages_written": len(new_messages),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
 @app.get("/api/chats/{chat_id}/messages", response_model=List[ChatMessage])
-async def get_chat_messages(chat_id: str):
-    """Get messages for a specific chat"""
-    if chat_id not in chats_db:
+async def get_chat_messages(chat_id: str, limit: Optional[int] = Query(None, ge=1, le=200),
+                            offset: int = Query(0, ge=0)):
+    """Get messages for a specific chat, oldest first; without `limit` all of them from `offset` on"""
+    if not await chat_store.has_chat(chat_id):
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    messages = [msg for msg in messages_db.values() if msg.chat_id == chat_id]
-    return sorted(messages, key=lambda x: x.timestamp)
+    return await chat_store.get_messages(chat_id, limit, offset)
 
 @app.get("/api/visualization/{message_id}", response_class=HTMLResponse)
 async def get_visualization(message_id: str):
     """Get HTML visualization for a specific message"""
-    if message_id not in messages_db:
+    message = await chat_store.get_message(message_id)
+    if message is None:
         raise HTTPException(status_code=404, detail="Message not found")
     
-    message = messages_db[message_id]
     if not message.metadata or "visualization_html" not in message.metadata:
         raise HTTPException(status_code=404, detail="Visualization not found")
     
@@ -289,7 +742,7 @@ async def get_visualization(message_id: str):
 @app.post("/api/chats/{chat_id}/messages", response_model=ChatMessage)
 async def send_message(chat_id: str, message: dict):
     """Send a message to a chat"""
-    if chat_id not in chats_db:
+    if not await chat_store.has_chat(chat_id):
         raise HTTPException(status_code=404, detail="Chat not found")
     
     msg_id = str(uuid.uuid4())
@@ -300,10 +753,10 @@ async def send_message(chat_id: str, message: dict):
         is_user=message.get("is_user", True),
         timestamp=datetime.now()
     )
-    messages_db[msg_id] = chat_message
+    await chat_store.add_message(chat_message)
     
     # Update chat timestamp
-    chats_db[chat_id].updated_at = datetime.now()
+    await chat_store.update_chat(chat_id, updated_at=datetime.now())
     
     return chat_message
 
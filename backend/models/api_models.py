@@ -7,6 +7,11 @@ class CodeRequest(BaseModel):
     language: str = "javascript"
     context: str = ""
     chat_id: Optional[str] = None
+    bypass_cache: bool = False
+    # Analyze top-level units separately and only resend the ones that changed
+    incremental: bool = False
+    # Map-reduce over chunks of the code; large submissions are chunked regardless
+    chunked: bool = False
 
 class ChatMessage(BaseModel):
     id: str
@@ -37,4 +42,5 @@ class ChatResponse(BaseModel):
 
 class QueryRequest(BaseModel):
     query: str
-    system_prompt: str
\ No newline at end of file
+    system_prompt: str
+    chat_id: Optional[str] = None
\ No newline at end of file
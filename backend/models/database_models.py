@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from uuid import UUID
 
 class ChatMessageDB(BaseModel):
     id: str
@@ -36,10 +37,87 @@ class CodeAnalysisDB(BaseModel):
     warnings: List[str]
     analysis_type: str
     created_at: datetime
+    visualization_html: Optional[str] = None
 
 class UserSessionDB(BaseModel):
     id: str
     session_token: str
     user_data: Dict[str, Any]
     created_at: datetime
-    expires_at: datetime
\ No newline at end of file
+    expires_at: datetime
+
+
+class ChatPageDB(BaseModel):
+    items: List[ChatDB]
+    next_cursor: Optional[str] = None
+
+class ChatMessagePageDB(BaseModel):
+    items: List[ChatMessageDB]
+    next_cursor: Optional[str] = None
+
+class CodeProjectSummaryDB(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    language: str
+    size: int
+    preview: str
+    created_at: datetime
+    updated_at: datetime
+    user_id: Optional[str] = None
+
+class CodeProjectPageDB(BaseModel):
+    items: List[CodeProjectSummaryDB]
+    next_cursor: Optional[str] = None
+
+class CodeSearchResultDB(CodeProjectSummaryDB):
+    rank: float
+    snippet: str
+
+class CodeAnalysisSummaryDB(BaseModel):
+    id: str
+    project_id: str
+    analysis_type: str
+    size: int
+    preview: Optional[str] = None
+    suggestion_count: int
+    warning_count: int
+    created_at: datetime
+
+class ChatMessageImportDB(BaseModel):
+    id: Optional[UUID] = None
+    chat_id: UUID
+    content: str
+    is_user: bool
+    timestamp: Optional[datetime] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+class CodeProjectImportDB(BaseModel):
+    id: Optional[UUID] = None
+    name: str
+    description: Optional[str] = None
+    language: str
+    code_content: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    user_id: Optional[UUID] = None
+
+class BulkInsertResultDB(BaseModel):
+    inserted: int
+    chats_updated: int = 0
+    elapsed_seconds: float
+    rows_per_second: float
+
+class ProjectVersionDB(BaseModel):
+    version: int
+    kind: str
+    size: int
+    stored_bytes: int
+    created_at: datetime
+
+class ProjectRevisionDB(BaseModel):
+    project_id: str
+    version: int
+    code_content: str
+    created_at: datetime
+    deltas_applied: int
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from typing import List, Optional, Dict, Any, Union
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import asyncio
+import io
+import time
+from psycopg2.extras import RealDictCursor, execute_values
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
+import base64
+import hashlib
 import json
+import re
 from contextlib import contextmanager
-from models.database_models import ChatMessageDB, ChatDB, CodeProjectDB, CodeAnalysisDB, UserSessionDB
+from pydantic import BaseModel, ValidationError
+from models.database_models import (ChatMessageDB, ChatDB, CodeProjectDB, CodeAnalysisDB, UserSessionDB, ChatPageDB, ChatMessagePageDB, CodeSearchResultDB,
+                                    CodeProjectSummaryDB, CodeProjectPageDB, CodeAnalysisSummaryDB,
+                                    ChatMessageImportDB, CodeProjectImportDB, BulkInsertResultDB,
+                                    ProjectVersionDB, ProjectRevisionDB)
+from db_pool import DBPool, PoolTimeout
+from code_delta import compress_snapshot, content_hash, encode_revision, rebuild
 
 # Database configuration
 DATABASE_CONFIG = {
@@ -20,20 +32,25 @@ DATABASE_CONFIG = {
 
 # Pydantic models imported from models.database_models
 
+# Shared connection pool, opened and closed by the app lifespan in main.py
+db_pool = DBPool(DATABASE_CONFIG)
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))
+# Most revisions between two full snapshots, which bounds the deltas applied on rebuild
+PROJECT_SNAPSHOT_INTERVAL = int(os.getenv("PROJECT_SNAPSHOT_INTERVAL", "20"))
+# The analytics summary compacts the counter deltas once there are more than this many
+ANALYTICS_COMPACT_ABOVE = int(os.getenv("ANALYTICS_COMPACT_ABOVE", "1000"))
+
 # Database connection manager
 @contextmanager
 def get_db_connection():
-    conn = None
     try:
-        conn = psycopg2.connect(**DATABASE_CONFIG)
-        yield conn
+        with db_pool.connection() as conn:
+            yield conn
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=f"Database busy: {str(e)}")
     except psycopg2.Error as e:
-        if conn:
-            conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 # Database initialization SQL
 DATABASE_SCHEMA = """
@@ -108,14 +125,246 @@ CREATE INDEX IF NOT EXISTS idx_code_projects_user_id ON code_projects(user_id);
 CREATE INDEX IF NOT EXISTS idx_code_analysis_project_id ON code_analysis(project_id);
 CREATE INDEX IF NOT EXISTS idx_user_sessions_token ON user_sessions(session_token);
 CREATE INDEX IF NOT EXISTS idx_chats_user_id ON chats(user_id);
+
+-- Keyset pagination: (updated_at, id) for chats, (timestamp, id) within a chat,
+CREATE INDEX IF NOT EXISTS idx_chats_updated_at_id ON chats(updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_chats_user_id_updated_at_id ON chats(user_id, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_id_timestamp_id ON chat_messages(chat_id, timestamp, id);
+-- and (updated_at, id) for projects, also within a language or a user
+CREATE INDEX IF NOT EXISTS idx_code_projects_updated_at_id ON code_projects(updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_code_projects_user_id_updated_at_id ON code_projects(user_id, updated_at DESC, id DESC);
+
+ALTER TABLE code_analysis ADD COLUMN IF NOT EXISTS visualization_html TEXT;
+
+-- Content-addressed analysis results shared by every worker. They have no project,
+-- so they live apart from code_analysis and stay out of its listings and counts
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    original_code TEXT NOT NULL,
+    corrected_code TEXT,
+    explanation TEXT,
+    visualization_html TEXT,
+    suggestions JSONB,
+    warnings JSONB,
+    analysis_type VARCHAR(50),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Cache rows used to be stored in code_analysis: move them over once
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'code_analysis' AND column_name = 'cache_key') THEN
+        INSERT INTO analysis_cache (cache_key, original_code, corrected_code, explanation, visualization_html,
+                                    suggestions, warnings, analysis_type, created_at)
+        SELECT cache_key, original_code, corrected_code, explanation, visualization_html,
+               suggestions, warnings, analysis_type, created_at
+        FROM code_analysis WHERE cache_key IS NOT NULL
+        ON CONFLICT (cache_key) DO NOTHING;
+        DELETE FROM code_analysis WHERE cache_key IS NOT NULL;
+        ALTER TABLE code_analysis DROP COLUMN cache_key;
+    END IF;
+END;
+$$;
+
+-- Full-text search over projects. 'simple' keeps identifiers unstemmed; names weigh
+-- most, then descriptions, then code. Code is capped so huge files stay under the
+-- 1MB tsvector limit.
+ALTER TABLE code_projects ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('simple', left(code_content, 100000)), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_code_projects_search_vector ON code_projects USING GIN (search_vector);
+DROP INDEX IF EXISTS idx_code_projects_language_updated_at;
+CREATE INDEX IF NOT EXISTS idx_code_projects_language_updated_at_id ON code_projects(language, updated_at DESC, id DESC);
+
+-- Size and preview for list views, stored so listings never read the full code
+ALTER TABLE code_projects ADD COLUMN IF NOT EXISTS code_size INTEGER GENERATED ALWAYS AS (LENGTH(code_content)) STORED;
+ALTER TABLE code_projects ADD COLUMN IF NOT EXISTS code_preview TEXT GENERATED ALWAYS AS (LEFT(code_content, 200)) STORED;
+ALTER TABLE code_analysis ADD COLUMN IF NOT EXISTS code_size INTEGER GENERATED ALWAYS AS (LENGTH(original_code)) STORED;
+ALTER TABLE code_analysis ADD COLUMN IF NOT EXISTS explanation_preview TEXT GENERATED ALWAYS AS (LEFT(explanation, 200)) STORED;
+
+-- Project history: zlib-compressed full snapshots, and between them line deltas
+-- against the previous revision (see code_delta.py)
+CREATE TABLE IF NOT EXISTS project_versions (
+    project_id UUID REFERENCES code_projects(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    kind VARCHAR(8) NOT NULL,
+    data BYTEA NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (project_id, version)
+);
+
+-- Row counts and per-language aggregates maintained by statement-level triggers,
+-- so the analytics endpoints read a few rows instead of scanning the tables.
+-- Counts are append-only deltas summed on read: a single counter row per table
+-- would serialize every write to it, and compact_analytics() folds them back up.
+DROP TABLE IF EXISTS analytics_counters;
+CREATE TABLE IF NOT EXISTS analytics_counter_deltas (
+    name VARCHAR(64) NOT NULL,
+    value BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS language_stats (
+    language VARCHAR(50) PRIMARY KEY,
+    project_count BIGINT NOT NULL DEFAULT 0,
+    total_code_length BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION count_rows() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO analytics_counter_deltas (name, value) SELECT TG_TABLE_NAME, COUNT(*) FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO analytics_counter_deltas (name, value) SELECT TG_TABLE_NAME, -COUNT(*) FROM old_rows;
+    ELSIF TG_OP = 'TRUNCATE' THEN
+        -- TRUNCATE holds the table exclusively, so no other writer has deltas pending for it
+        DELETE FROM analytics_counter_deltas WHERE name = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION track_language_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM language_stats;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE language_stats SET
+            project_count = language_stats.project_count - removed.project_count,
+            total_code_length = language_stats.total_code_length - removed.total_code_length
+        FROM (
+            SELECT language, COUNT(*) AS project_count, SUM(LENGTH(code_content)) AS total_code_length
+            FROM old_rows GROUP BY language
+        ) AS removed
+        WHERE language_stats.language = removed.language;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO language_stats (language, project_count, total_code_length)
+        SELECT language, COUNT(*), SUM(LENGTH(code_content)) FROM new_rows GROUP BY language
+        ON CONFLICT (language) DO UPDATE SET
+            project_count = language_stats.project_count + EXCLUDED.project_count,
+            total_code_length = language_stats.total_code_length + EXCLUDED.total_code_length;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recomputes both tables from scratch; SHARE mode holds off writers meanwhile
+CREATE OR REPLACE FUNCTION refresh_analytics() RETURNS void AS $$
+BEGIN
+    LOCK TABLE chats, chat_messages, code_projects, code_analysis IN SHARE MODE;
+
+    DELETE FROM analytics_counter_deltas;
+    INSERT INTO analytics_counter_deltas (name, value) VALUES
+        ('chats', (SELECT COUNT(*) FROM chats)),
+        ('chat_messages', (SELECT COUNT(*) FROM chat_messages)),
+        ('code_projects', (SELECT COUNT(*) FROM code_projects)),
+        ('code_analysis', (SELECT COUNT(*) FROM code_analysis));
+
+    DELETE FROM language_stats;
+    INSERT INTO language_stats (language, project_count, total_code_length)
+    SELECT language, COUNT(*), SUM(LENGTH(code_content)) FROM code_projects GROUP BY language;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Replaces the deltas of every counter with their sum; deltas committed meanwhile are left for the next run
+CREATE OR REPLACE FUNCTION compact_analytics() RETURNS void AS $$
+BEGIN
+    WITH removed AS (DELETE FROM analytics_counter_deltas RETURNING name, value)
+    INSERT INTO analytics_counter_deltas (name, value)
+    SELECT name, SUM(value) FROM removed GROUP BY name;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    counted TEXT;
+BEGIN
+    FOREACH counted IN ARRAY ARRAY['chats', 'chat_messages', 'code_projects', 'code_analysis'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %1$s_count_insert ON %1$s', counted);
+        EXECUTE format('CREATE TRIGGER %1$s_count_insert AFTER INSERT ON %1$s
+                        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION count_rows()', counted);
+        EXECUTE format('DROP TRIGGER IF EXISTS %1$s_count_delete ON %1$s', counted);
+        EXECUTE format('CREATE TRIGGER %1$s_count_delete AFTER DELETE ON %1$s
+                        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION count_rows()', counted);
+        EXECUTE format('DROP TRIGGER IF EXISTS %1$s_count_truncate ON %1$s', counted);
+        EXECUTE format('CREATE TRIGGER %1$s_count_truncate AFTER TRUNCATE ON %1$s
+                        FOR EACH STATEMENT EXECUTE FUNCTION count_rows()', counted);
+    END LOOP;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS code_projects_language_insert ON code_projects;
+CREATE TRIGGER code_projects_language_insert AFTER INSERT ON code_projects
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION track_language_stats();
+DROP TRIGGER IF EXISTS code_projects_language_update ON code_projects;
+CREATE TRIGGER code_projects_language_update AFTER UPDATE ON code_projects
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION track_language_stats();
+DROP TRIGGER IF EXISTS code_projects_language_delete ON code_projects;
+CREATE TRIGGER code_projects_language_delete AFTER DELETE ON code_projects
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION track_language_stats();
+DROP TRIGGER IF EXISTS code_projects_language_truncate ON code_projects;
+CREATE TRIGGER code_projects_language_truncate AFTER TRUNCATE ON code_projects
+    FOR EACH STATEMENT EXECUTE FUNCTION track_language_stats();
+
+-- Backfill once, when the counters are first created
+SELECT refresh_analytics() WHERE NOT EXISTS (SELECT 1 FROM analytics_counter_deltas);
+"""
+
+# Columns of code_projects without the search vector, for SELECT and RETURNING
+CODE_PROJECT_COLUMNS = "id, name, description, language, code_content, created_at, updated_at, user_id"
+
+# Columns of the list and search views: no code, just its size and first lines
+CODE_PROJECT_SUMMARY_COLUMNS = ("id, name, description, language, code_size AS size, code_preview AS preview, "
+                                "created_at, updated_at, user_id")
+
+CODE_ANALYSIS_SUMMARY_COLUMNS = """
+    id, project_id, analysis_type, code_size AS size, explanation_preview AS preview,
+    COALESCE(jsonb_array_length(suggestions), 0) AS suggestion_count,
+    COALESCE(jsonb_array_length(warnings), 0) AS warning_count, created_at
 """
 
-# APIRouter for PostgreSQL operations
+# Conditional GET for detail endpoints: the ETag is derived from the row's id and
+# version timestamp, so a 304 is answered without reading the row's text
+def make_etag(row_id, version: datetime) -> str:
+    return '"' + hashlib.sha1(f"{row_id}:{version.isoformat()}".encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+# Keyset pagination cursors: opaque base64 of the sort key of the last row of a page
+def encode_cursor(sort_value: datetime, row_id) -> str:
+    payload = json.dumps([sort_value.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), str(uuid.UUID(row_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# APIRouter for PostgreSQL operations.
+# Handlers are plain `def`: psycopg2 blocks, so FastAPI runs them in its threadpool
+# and a slow query only holds one pooled connection instead of the event loop.
+# Handlers that need the raw body stay async and hand the work to a thread.
 postgres_router = APIRouter(prefix="/api/db", tags=["database"])
 
 # Database initialization endpoint
 @postgres_router.post("/init")
-async def initialize_database():
+def initialize_database():
     """Initialize database schema"""
     try:
         with get_db_connection() as conn:
@@ -128,7 +377,7 @@ async def initialize_database():
 
 # Chat endpoints
 @postgres_router.post("/chats", response_model=ChatDB)
-async def create_chat(title: str, user_id: Optional[str] = None):
+def create_chat(title: str, user_id: Optional[str] = None):
     """Create a new chat"""
     chat_id = str(uuid.uuid4())
     now = datetime.now()
@@ -145,30 +394,32 @@ async def create_chat(title: str, user_id: Optional[str] = None):
             
     return ChatDB(**result)
 
-@postgres_router.get("/chats", response_model=List[ChatDB])
-async def get_chats(user_id: Optional[str] = None, limit: int = 50, offset: int = 0):
-    """Get all chats with pagination"""
+@postgres_router.get("/chats", response_model=ChatPageDB)
+def get_chats(user_id: Optional[str] = None, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    """Get chats, most recently updated first; pass `next_cursor` back as `cursor` for the next page"""
+    query = "SELECT * FROM chats WHERE 1=1"
+    params = []
+    if user_id:
+        query += " AND user_id = %s"
+        params.append(user_id)
+    if cursor:
+        query += " AND (updated_at, id) < (%s, %s)"
+        params.extend(decode_cursor(cursor))
+    # One extra row tells whether there is a next page
+    query += " ORDER BY updated_at DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+
     with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            if user_id:
-                cursor.execute("""
-                    SELECT * FROM chats 
-                    WHERE user_id = %s 
-                    ORDER BY updated_at DESC 
-                    LIMIT %s OFFSET %s
-                """, (user_id, limit, offset))
-            else:
-                cursor.execute("""
-                    SELECT * FROM chats 
-                    ORDER BY updated_at DESC 
-                    LIMIT %s OFFSET %s
-                """, (limit, offset))
-            results = cursor.fetchall()
-            
-    return [ChatDB(**row) for row in results]
+        with conn.cursor(cursor_factory=RealDictCursor) as db_cursor:
+            db_cursor.execute(query, params)
+            results = db_cursor.fetchall()
+
+    rows = results[:limit]
+    next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"]) if len(results) > limit else None
+    return ChatPageDB(items=[ChatDB(**row) for row in rows], next_cursor=next_cursor)
 
 @postgres_router.get("/chats/{chat_id}", response_model=ChatDB)
-async def get_chat(chat_id: str):
+def get_chat(chat_id: str):
     """Get a specific chat by ID"""
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -180,7 +431,7 @@ async def get_chat(chat_id: str):
     return ChatDB(**result)
 
 @postgres_router.delete("/chats/{chat_id}")
-async def delete_chat(chat_id: str):
+def delete_chat(chat_id: str):
     """Delete a chat and all its messages"""
     with get_db_connection() as conn:
         with conn.cursor() as cursor:
@@ -192,7 +443,7 @@ async def delete_chat(chat_id: str):
 
 # Chat message endpoints
 @postgres_router.post("/chats/{chat_id}/messages", response_model=ChatMessageDB)
-async def create_message(chat_id: str, content: str, is_user: bool, metadata: Optional[Dict[str, Any]] = None):
+def create_message(chat_id: str, content: str, is_user: bool, metadata: Optional[Dict[str, Any]] = None):
     """Create a new message in a chat"""
     message_id = str(uuid.uuid4())
     now = datetime.now()
@@ -212,24 +463,209 @@ async def create_message(chat_id: str, content: str, is_user: bool, metadata: Op
             
     return ChatMessageDB(**result)
 
-@postgres_router.get("/chats/{chat_id}/messages", response_model=List[ChatMessageDB])
-async def get_chat_messages(chat_id: str, limit: int = 100, offset: int = 0):
-    """Get all messages for a chat"""
+@postgres_router.get("/chats/{chat_id}/messages", response_model=ChatMessagePageDB)
+def get_chat_messages(chat_id: str, limit: int = Query(100, ge=1, le=200), cursor: Optional[str] = None):
+    """Get messages for a chat, oldest first; pass `next_cursor` back as `cursor` for the next page"""
+    query = "SELECT * FROM chat_messages WHERE chat_id = %s"
+    params = [chat_id]
+    if cursor:
+        query += " AND (timestamp, id) > (%s, %s)"
+        params.extend(decode_cursor(cursor))
+    query += " ORDER BY timestamp ASC, id ASC LIMIT %s"
+    params.append(limit + 1)
+
     with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""
-                SELECT * FROM chat_messages 
-                WHERE chat_id = %s 
-                ORDER BY timestamp ASC 
-                LIMIT %s OFFSET %s
-            """, (chat_id, limit, offset))
-            results = cursor.fetchall()
-            
-    return [ChatMessageDB(**row) for row in results]
+        with conn.cursor(cursor_factory=RealDictCursor) as db_cursor:
+            db_cursor.execute(query, params)
+            results = db_cursor.fetchall()
+
+    rows = results[:limit]
+    next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"]) if len(results) > limit else None
+    return ChatMessagePageDB(items=[ChatMessageDB(**row) for row in rows], next_cursor=next_cursor)
+
+# Bulk import: NDJSON or a JSON array, loaded with one COPY in one transaction
+def parse_bulk_rows(body: bytes, content_type: str, model) -> List[BaseModel]:
+    """Parses a JSON array or NDJSON body into `model` instances; 422 names the first bad row or the duplicate ids"""
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8: {e}")
+
+    try:
+        if "ndjson" in content_type or not text.lstrip().startswith("["):
+            items = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            items = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid JSON: {e}")
+
+    if len(items) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+
+    rows = []
+    for index, item in enumerate(items):
+        try:
+            rows.append(model(**item))
+        except (ValidationError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=f"Row {index}: {e}")
+
+    # A repeated id would only fail the COPY as a whole, name the rows instead
+    positions = {}
+    for index, row in enumerate(rows):
+        if row.id is not None:
+            positions.setdefault(row.id, []).append(index)
+    duplicates = {str(row_id): indexes for row_id, indexes in positions.items() if len(indexes) > 1}
+    if duplicates:
+        details = "; ".join(f"{row_id} in rows {indexes}" for row_id, indexes in list(duplicates.items())[:10])
+        raise HTTPException(status_code=422, detail=f"Duplicate ids: {details}")
+    return rows
+
+def _copy_value(value) -> str:
+    # COPY text format: \N is NULL, and backslash, tab and newlines are escaped
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def copy_rows(cursor, table: str, columns: List[str], rows: List[tuple]):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row) + "\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # TIMESTAMP columns drop the offset on COPY, and aware values can't be compared with naive ones
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def bulk_result(inserted: int, started: float, chats_updated: int = 0) -> BulkInsertResultDB:
+    elapsed = time.perf_counter() - started
+    return BulkInsertResultDB(
+        inserted=inserted,
+        chats_updated=chats_updated,
+        elapsed_seconds=round(elapsed, 4),
+        rows_per_second=round(inserted / elapsed, 1) if elapsed else 0.0
+    )
+
+def bulk_insert_messages(body: bytes, content_type: str) -> BulkInsertResultDB:
+    started = time.perf_counter()
+    messages = parse_bulk_rows(body, content_type, ChatMessageImportDB)
+    if not messages:
+        return bulk_result(0, started)
+
+    now = datetime.now()
+    rows, latest = [], {}
+    for message in messages:
+        timestamp = naive_utc(message.timestamp) or now
+        rows.append((message.id or uuid.uuid4(), message.chat_id, message.content, message.is_user,
+                     timestamp, json.dumps(message.metadata) if message.metadata else None))
+        chat_id = str(message.chat_id)
+        latest[chat_id] = max(latest.get(chat_id, timestamp), timestamp)
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id::text FROM chats WHERE id = ANY(%s::uuid[])", (list(latest),))
+            missing = set(latest) - {row[0] for row in cursor.fetchall()}
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Chats not found: {sorted(missing)[:10]}")
+
+            copy_rows(cursor, "chat_messages", ["id", "chat_id", "content", "is_user", "timestamp", "metadata"], rows)
+
+            # One update per chat, moving updated_at up to its newest imported message
+            execute_values(cursor, """
+                UPDATE chats SET updated_at = GREATEST(chats.updated_at, latest.timestamp)
+                FROM (VALUES %s) AS latest (chat_id, timestamp)
+                WHERE chats.id = latest.chat_id::uuid
+            """, list(latest.items()))
+            conn.commit()
+
+    return bulk_result(len(rows), started, chats_updated=len(latest))
+
+def bulk_insert_projects(body: bytes, content_type: str) -> BulkInsertResultDB:
+    started = time.perf_counter()
+    projects = parse_bulk_rows(body, content_type, CodeProjectImportDB)
+    if not projects:
+        return bulk_result(0, started)
+
+    now = datetime.now()
+    rows, user_ids = [], set()
+    for project in projects:
+        created_at = naive_utc(project.created_at) or now
+        rows.append((project.id or uuid.uuid4(), project.name, project.description, project.language,
+                     project.code_content, created_at, naive_utc(project.updated_at) or created_at, project.user_id))
+        if project.user_id is not None:
+            user_ids.add(str(project.user_id))
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            if user_ids:
+                cursor.execute("SELECT id::text FROM users WHERE id = ANY(%s::uuid[])", (list(user_ids),))
+                missing = user_ids - {row[0] for row in cursor.fetchall()}
+                if missing:
+                    raise HTTPException(status_code=404, detail=f"Users not found: {sorted(missing)[:10]}")
+
+            copy_rows(cursor, "code_projects", ["id", "name", "description", "language", "code_content",
+                                                "created_at", "updated_at", "user_id"], rows)
+            conn.commit()
+
+    return bulk_result(len(rows), started)
+
+@postgres_router.post("/messages/bulk", response_model=BulkInsertResultDB)
+async def bulk_create_messages(request: Request):
+    """Import chat messages from NDJSON or a JSON array; every referenced chat must exist"""
+    body = await request.body()
+    return await asyncio.to_thread(bulk_insert_messages, body, request.headers.get("content-type", ""))
+
+@postgres_router.post("/projects/bulk", response_model=BulkInsertResultDB)
+async def bulk_create_projects(request: Request):
+    """Import code projects from NDJSON or a JSON array; every referenced user must exist"""
+    body = await request.body()
+    return await asyncio.to_thread(bulk_insert_projects, body, request.headers.get("content-type", ""))
+
+# Project versioning
+def _insert_version(cursor, project_id: str, version: int, kind: str, data: bytes, code_content: str,
+                    created_at: datetime):
+    cursor.execute("""
+        INSERT INTO project_versions (project_id, version, kind, data, size, content_hash, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (project_id, version, kind, psycopg2.Binary(data), len(code_content), content_hash(code_content), created_at))
+
+def record_project_version(cursor, project_id: str, code_content: str, created_at: datetime,
+                           previous: Optional[str] = None, previous_at: Optional[datetime] = None):
+    """
+        Appends a revision of a project inside the caller's transaction.
+
+        A revision is stored as a delta against the one before it, unless
+        PROJECT_SNAPSHOT_INTERVAL revisions have passed since the last snapshot or
+        the delta would not be smaller than a snapshot. Projects without history
+        (created before versioning or bulk imported) first get `previous` as version 1.
+    """
+    cursor.execute("""
+        SELECT MAX(version) AS latest, MAX(version) FILTER (WHERE kind = 'snapshot') AS latest_snapshot
+        FROM project_versions WHERE project_id = %s
+    """, (project_id,))
+    row = cursor.fetchone()
+    latest, latest_snapshot = row["latest"], row["latest_snapshot"]
+
+    if latest is None and previous is not None:
+        _insert_version(cursor, project_id, 1, "snapshot", compress_snapshot(previous), previous,
+                        previous_at or created_at)
+        latest = latest_snapshot = 1
+
+    version = (latest or 0) + 1
+    since_snapshot = version - latest_snapshot if latest is not None else None
+    kind, data = encode_revision(previous, code_content, since_snapshot, PROJECT_SNAPSHOT_INTERVAL)
+    _insert_version(cursor, project_id, version, kind, data, code_content, created_at)
 
 # Code project endpoints
 @postgres_router.post("/projects", response_model=CodeProjectDB)
-async def create_code_project(
+def create_code_project(
     name: str, 
     language: str, 
     code_content: str, 
@@ -242,71 +678,160 @@ async def create_code_project(
     
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""
+            cursor.execute(f"""
                 INSERT INTO code_projects (id, name, description, language, code_content, created_at, updated_at, user_id)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING *
+                RETURNING {CODE_PROJECT_COLUMNS}
             """, (project_id, name, description, language, code_content, now, now, user_id))
             result = cursor.fetchone()
+            record_project_version(cursor, project_id, code_content, now)
             conn.commit()
             
     return CodeProjectDB(**result)
 
-@postgres_router.get("/projects", response_model=List[CodeProjectDB])
-async def get_code_projects(language: Optional[str] = None, user_id: Optional[str] = None, limit: int = 50):
-    """Get code projects with optional filtering"""
+@postgres_router.get("/projects", response_model=CodeProjectPageDB)
+def get_code_projects(language: Optional[str] = None, user_id: Optional[str] = None,
+                      limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    """
+        Get code project summaries, most recently updated first, with optional filtering;
+        pass `next_cursor` back as `cursor` for the next page. The code comes from /projects/{id}.
+    """
+    query = f"SELECT {CODE_PROJECT_SUMMARY_COLUMNS} FROM code_projects WHERE 1=1"
+    params = []
+    if language:
+        query += " AND language = %s"
+        params.append(language)
+    if user_id:
+        query += " AND user_id = %s"
+        params.append(user_id)
+    if cursor:
+        query += " AND (updated_at, id) < (%s, %s)"
+        params.extend(decode_cursor(cursor))
+    # One extra row tells whether there is a next page
+    query += " ORDER BY updated_at DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as db_cursor:
+            db_cursor.execute(query, params)
+            results = db_cursor.fetchall()
+
+    rows = results[:limit]
+    next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"]) if len(results) > limit else None
+    return CodeProjectPageDB(items=[CodeProjectSummaryDB(**row) for row in rows], next_cursor=next_cursor)
+
+@postgres_router.get("/projects/{project_id}", response_model=CodeProjectDB)
+def get_code_project(project_id: str, request: Request, response: Response):
+    """Get a code project with its full code; answers 304 when If-None-Match still matches"""
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            query = "SELECT * FROM code_projects WHERE 1=1"
-            params = []
-            
-            if language:
-                query += " AND language = %s"
-                params.append(language)
-            if user_id:
-                query += " AND user_id = %s"
-                params.append(user_id)
-                
-            query += " ORDER BY updated_at DESC LIMIT %s"
-            params.append(limit)
-            
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-            
-    return [CodeProjectDB(**row) for row in results]
+            cursor.execute("SELECT updated_at FROM code_projects WHERE id = %s", (project_id,))
+            version = cursor.fetchone()
+            if not version:
+                raise HTTPException(status_code=404, detail="Project not found")
+
+            etag = make_etag(project_id, version["updated_at"])
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+            cursor.execute(f"SELECT {CODE_PROJECT_COLUMNS} FROM code_projects WHERE id = %s", (project_id,))
+            result = cursor.fetchone()
+
+    if not result:
+        raise HTTPException(status_code=404, detail="Project not found")
+    response.headers["ETag"] = make_etag(project_id, result["updated_at"])
+    response.headers["Cache-Control"] = "no-cache"
+    return CodeProjectDB(**result)
 
 @postgres_router.put("/projects/{project_id}", response_model=CodeProjectDB)
-async def update_code_project(project_id: str, code_content: str, name: Optional[str] = None):
-    """Update a code project"""
+def update_code_project(project_id: str, code_content: str, name: Optional[str] = None):
+    """Update a code project, recording the new code as its next version"""
     now = datetime.now()
     
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Locks the row so concurrent updates number their versions one after the other
+            cursor.execute("SELECT code_content, updated_at FROM code_projects WHERE id = %s FOR UPDATE", (project_id,))
+            current = cursor.fetchone()
+            if not current:
+                raise HTTPException(status_code=404, detail="Project not found")
+
             if name:
-                cursor.execute("""
+                cursor.execute(f"""
                     UPDATE code_projects 
                     SET code_content = %s, name = %s, updated_at = %s 
                     WHERE id = %s 
-                    RETURNING *
+                    RETURNING {CODE_PROJECT_COLUMNS}
                 """, (code_content, name, now, project_id))
             else:
-                cursor.execute("""
+                cursor.execute(f"""
                     UPDATE code_projects 
                     SET code_content = %s, updated_at = %s 
                     WHERE id = %s 
-                    RETURNING *
+                    RETURNING {CODE_PROJECT_COLUMNS}
                 """, (code_content, now, project_id))
                 
             result = cursor.fetchone()
-            if not result:
-                raise HTTPException(status_code=404, detail="Project not found")
+            if current["code_content"] != code_content:
+                record_project_version(cursor, project_id, code_content, now,
+                                       previous=current["code_content"], previous_at=current["updated_at"])
             conn.commit()
             
     return CodeProjectDB(**result)
 
+@postgres_router.get("/projects/{project_id}/versions", response_model=List[ProjectVersionDB])
+def list_project_versions(project_id: str):
+    """List the stored versions of a project, newest first"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT version, kind, size, octet_length(data) AS stored_bytes, created_at
+                FROM project_versions
+                WHERE project_id = %s
+                ORDER BY version DESC
+            """, (project_id,))
+            results = cursor.fetchall()
+            if not results:
+                cursor.execute("SELECT 1 FROM code_projects WHERE id = %s", (project_id,))
+                if not cursor.fetchone():
+                    raise HTTPException(status_code=404, detail="Project not found")
+
+    return [ProjectVersionDB(**row) for row in results]
+
+@postgres_router.get("/projects/{project_id}/versions/{version}", response_model=ProjectRevisionDB)
+def get_project_version(project_id: str, version: int):
+    """Rebuild the code of one version from its snapshot and the deltas after it"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT version, data, content_hash, created_at
+                FROM project_versions
+                WHERE project_id = %s AND version <= %s AND version >= (
+                    SELECT MAX(version) FROM project_versions
+                    WHERE project_id = %s AND version <= %s AND kind = 'snapshot'
+                )
+                ORDER BY version
+            """, (project_id, version, project_id, version))
+            rows = cursor.fetchall()
+
+    if not rows or rows[-1]["version"] != version:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    code_content = rebuild(bytes(rows[0]["data"]), [bytes(row["data"]) for row in rows[1:]])
+    if content_hash(code_content) != rows[-1]["content_hash"]:
+        raise HTTPException(status_code=500, detail=f"Version {version} failed its integrity check")
+
+    return ProjectRevisionDB(
+        project_id=project_id,
+        version=version,
+        code_content=code_content,
+        created_at=rows[-1]["created_at"],
+        deltas_applied=len(rows) - 1
+    )
+
 # Code analysis endpoints
 @postgres_router.post("/analysis", response_model=CodeAnalysisDB)
-async def create_code_analysis(
+def create_code_analysis(
     project_id: str,
     original_code: str,
     corrected_code: Optional[str] = None,
@@ -337,90 +862,224 @@ async def create_code_analysis(
             
     return CodeAnalysisDB(**result)
 
-@postgres_router.get("/analysis/project/{project_id}", response_model=List[CodeAnalysisDB])
-async def get_project_analysis(project_id: str, analysis_type: Optional[str] = None):
-    """Get all analysis for a project"""
+@postgres_router.get("/analysis/project/{project_id}", response_model=List[CodeAnalysisSummaryDB])
+def get_project_analysis(project_id: str, analysis_type: Optional[str] = None):
+    """Get analysis summaries for a project; the full analysis comes from /analysis/{id}"""
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
             if analysis_type:
-                cursor.execute("""
-                    SELECT * FROM code_analysis 
+                cursor.execute(f"""
+                    SELECT {CODE_ANALYSIS_SUMMARY_COLUMNS} FROM code_analysis 
                     WHERE project_id = %s AND analysis_type = %s 
                     ORDER BY created_at DESC
                 """, (project_id, analysis_type))
             else:
-                cursor.execute("""
-                    SELECT * FROM code_analysis 
+                cursor.execute(f"""
+                    SELECT {CODE_ANALYSIS_SUMMARY_COLUMNS} FROM code_analysis 
                     WHERE project_id = %s 
                     ORDER BY created_at DESC
                 """, (project_id,))
             results = cursor.fetchall()
             
-    return [CodeAnalysisDB(**row) for row in results]
+    return [CodeAnalysisSummaryDB(**row) for row in results]
+
+@postgres_router.get("/analysis/{analysis_id}", response_model=CodeAnalysisDB)
+def get_code_analysis(analysis_id: str, request: Request, response: Response):
+    """Get a full code analysis; analyses never change, so a matching If-None-Match gets a 304"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("SELECT created_at FROM code_analysis WHERE id = %s", (analysis_id,))
+            version = cursor.fetchone()
+            if not version:
+                raise HTTPException(status_code=404, detail="Analysis not found")
+
+            etag = make_etag(analysis_id, version["created_at"])
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+            cursor.execute("SELECT * FROM code_analysis WHERE id = %s", (analysis_id,))
+            result = cursor.fetchone()
+
+    if not result:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    response.headers["ETag"] = make_etag(analysis_id, result["created_at"])
+    response.headers["Cache-Control"] = "no-cache"
+    return CodeAnalysisDB(**result)
+
+# Analysis result cache storage (used by analysis_cache, not exposed as routes)
+def get_cached_analysis(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Get a cached analysis result by its content hash"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT corrected_code, explanation, visualization_html, suggestions, warnings
+                FROM analysis_cache
+                WHERE cache_key = %s
+            """, (cache_key,))
+            result = cursor.fetchone()
+
+    return dict(result) if result else None
+
+def store_cached_analysis(cache_key: str, original_code: str, result: Dict[str, Any], analysis_type: str = "general"):
+    """Store an analysis result under its content hash, keeping the first one on conflict"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO analysis_cache
+                (cache_key, original_code, corrected_code, explanation, visualization_html, suggestions, warnings,
+                 analysis_type, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (cache_key) DO NOTHING
+            """, (
+                cache_key, original_code, result["corrected_code"], result["explanation"],
+                result["visualization_html"], json.dumps(result["suggestions"]), json.dumps(result["warnings"]),
+                analysis_type, datetime.now()
+            ))
+            conn.commit()
 
 # Advanced search and analytics endpoints
+# Queries the counters replace; `exact=true` runs them to measure drift
+EXACT_SUMMARY_SQL = """
+    SELECT 
+        (SELECT COUNT(*) FROM chats) as total_chats,
+        (SELECT COUNT(*) FROM chat_messages) as total_messages,
+        (SELECT COUNT(*) FROM code_projects) as total_projects,
+        (SELECT COUNT(*) FROM code_analysis) as total_analyses,
+        (SELECT COUNT(DISTINCT language) FROM code_projects) as unique_languages
+"""
+
+EXACT_LANGUAGE_STATS_SQL = """
+    SELECT 
+        language,
+        COUNT(*) as project_count,
+        AVG(LENGTH(code_content)) as avg_code_length
+    FROM code_projects 
+    GROUP BY language 
+    ORDER BY project_count DESC
+"""
+
 @postgres_router.get("/analytics/summary")
-async def get_analytics_summary():
-    """Get overall analytics summary"""
+def get_analytics_summary(exact: bool = False):
+    """
+        Get overall analytics summary from the trigger-maintained counters. Their
+        deltas are compacted first once there are more than ANALYTICS_COMPACT_ABOVE.
+
+        With `exact=true` the totals are recounted from the tables instead and the
+        response adds `drift`, the recounted minus the maintained value of each total.
+    """
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("SELECT COUNT(*) AS deltas FROM analytics_counter_deltas")
+            if cursor.fetchone()["deltas"] > ANALYTICS_COMPACT_ABOVE:
+                cursor.execute("SELECT compact_analytics()")
+                conn.commit()
+
             cursor.execute("""
                 SELECT 
-                    (SELECT COUNT(*) FROM chats) as total_chats,
-                    (SELECT COUNT(*) FROM chat_messages) as total_messages,
-                    (SELECT COUNT(*) FROM code_projects) as total_projects,
-                    (SELECT COUNT(*) FROM code_analysis) as total_analyses,
-                    (SELECT COUNT(DISTINCT language) FROM code_projects) as unique_languages
+                    COALESCE(SUM(value) FILTER (WHERE name = 'chats'), 0) as total_chats,
+                    COALESCE(SUM(value) FILTER (WHERE name = 'chat_messages'), 0) as total_messages,
+                    COALESCE(SUM(value) FILTER (WHERE name = 'code_projects'), 0) as total_projects,
+                    COALESCE(SUM(value) FILTER (WHERE name = 'code_analysis'), 0) as total_analyses,
+                    (SELECT COUNT(*) FROM language_stats WHERE project_count > 0) as unique_languages
+                FROM analytics_counter_deltas
             """)
-            result = cursor.fetchone()
-            
-    return dict(result)
+            result = {name: int(value) for name, value in cursor.fetchone().items()}
+            if not exact:
+                return result
+
+            cursor.execute(EXACT_SUMMARY_SQL)
+            exact_result = dict(cursor.fetchone())
+
+    return {**exact_result, "drift": {name: exact_result[name] - result[name] for name in result}}
+
+@postgres_router.post("/analytics/refresh")
+def refresh_analytics():
+    """Recompute the analytics counters and language stats from the tables"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT refresh_analytics()")
+            conn.commit()
+    return {"message": "Analytics refreshed"}
 
-@postgres_router.get("/search/code")
-async def search_code_projects(query: str, language: Optional[str] = None, limit: int = 20):
-    """Search code projects by content"""
+@postgres_router.get("/search/code", response_model=List[CodeSearchResultDB])
+def search_code_projects(query: str, language: Optional[str] = None, limit: int = 20):
+    """
+        Full-text search over project names, descriptions and code, best matches first.
+
+        Every word of the query must match, as a prefix, a token of the project
+        (`pagin fastapi` finds `paginate` in FastAPI code). Results carry their
+        rank and a highlighted snippet of the matching code.
+    """
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return []
+    ts_query = " & ".join(f"{term}:*" for term in terms)
+
+    filters = "search_vector @@ q"
+    params = [ts_query]
+    if language:
+        filters += " AND language = %s"
+        params.append(language)
+    params.append(limit)
+
+    # Headlines are expensive, so only the page of best matches gets one
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            if language:
-                cursor.execute("""
-                    SELECT * FROM code_projects 
-                    WHERE (code_content ILIKE %s OR name ILIKE %s OR description ILIKE %s)
-                    AND language = %s
-                    ORDER BY updated_at DESC
+            cursor.execute(f"""
+                SELECT {CODE_PROJECT_SUMMARY_COLUMNS}, rank,
+                    ts_headline('simple', code_content, q,
+                                'MaxFragments=2, MinWords=5, MaxWords=20, StartSel=<<, StopSel=>>') AS snippet
+                FROM (
+                    SELECT code_projects.*, q, ts_rank_cd(search_vector, q) AS rank
+                    FROM code_projects, to_tsquery('simple', %s) AS q
+                    WHERE {filters}
+                    ORDER BY rank DESC, updated_at DESC
                     LIMIT %s
-                """, (f"%{query}%", f"%{query}%", f"%{query}%", language, limit))
-            else:
-                cursor.execute("""
-                    SELECT * FROM code_projects 
-                    WHERE code_content ILIKE %s OR name ILIKE %s OR description ILIKE %s
-                    ORDER BY updated_at DESC
-                    LIMIT %s
-                """, (f"%{query}%", f"%{query}%", f"%{query}%", limit))
+                ) AS matches
+                ORDER BY rank DESC, updated_at DESC
+            """, params)
             results = cursor.fetchall()
-            
-    return [CodeProjectDB(**row) for row in results]
+
+    return [CodeSearchResultDB(**row) for row in results]
 
 @postgres_router.get("/stats/languages")
-async def get_language_stats():
-    """Get statistics by programming language"""
+def get_language_stats(exact: bool = False):
+    """
+        Get statistics by programming language from the trigger-maintained aggregates.
+
+        With `exact=true` they are recomputed from `code_projects`, and each language
+        gets a `drift` of its recomputed minus maintained project count.
+    """
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cursor:
             cursor.execute("""
                 SELECT 
                     language,
-                    COUNT(*) as project_count,
-                    AVG(LENGTH(code_content)) as avg_code_length
-                FROM code_projects 
-                GROUP BY language 
+                    project_count,
+                    total_code_length::float / project_count as avg_code_length
+                FROM language_stats 
+                WHERE project_count > 0 
                 ORDER BY project_count DESC
             """)
             results = cursor.fetchall()
-            
-    return [dict(row) for row in results]
+            if not exact:
+                return [dict(row) for row in results]
+
+            cursor.execute(EXACT_LANGUAGE_STATS_SQL)
+            exact_results = cursor.fetchall()
+
+    maintained = {row["language"]: row["project_count"] for row in results}
+    return [
+        {**row, "drift": row["project_count"] - maintained.pop(row["language"], 0)}
+        for row in exact_results
+    ] + [
+        {"language": language, "project_count": 0, "avg_code_length": None, "drift": -count}
+        for language, count in maintained.items()
+    ]
 
 # Health check endpoint
 @postgres_router.get("/health")
-async def health_check():
+def health_check():
     """Check database connection health"""
     try:
         with get_db_connection() as conn:
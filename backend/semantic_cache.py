@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+# The frontend sends "code:\n<code>\n\nprompt:\n<question>", other clients fence their code
+CODE_SECTION_RE = re.compile(r"^code:\n(.*)\n\nprompt:\n", re.DOTALL)
+FENCE_RE = re.compile(r"```.*?(?:```|$)", re.DOTALL)
+
+def split_code(query: str) -> tuple:
+    """(question, code) of a query; code is everything in the code section and fenced blocks"""
+    code = []
+    match = CODE_SECTION_RE.match(query)
+    if match:
+        code.append(match.group(1))
+        query = query[match.end():]
+    code.extend(FENCE_RE.findall(query))
+    return FENCE_RE.sub(" ", query).strip(), "\n".join(code)
+
+def code_key(query: str) -> int:
+    """Exact hash of the code in a query; answers are only shared between queries about the same code"""
+    _, code = split_code(query)
+    normalized = "\n".join(line.rstrip() for line in code.strip().splitlines())
+    return int.from_bytes(hashlib.sha256(normalized.encode()).digest()[:8], "big", signed=True)
+
+class _Entry:
+    def __init__(self, slot: int, answer: str, payload: dict, dependencies: set, latency: float, ttl: float):
+        self.slot = slot
+        self.answer = answer
+        self.payload = payload
+        self.dependencies = dependencies
+        self.latency = latency
+        self.expires_at = time.monotonic() + ttl
+
+class SemanticCache:
+    """
+        Answer cache looked up by embedding similarity of (system_prompt, question).
+
+        Code in the query is not embedded: two code bodies with the same question
+        can be close enough to match, so an entry only matches queries whose code
+        hashes to the same `code_key`.
+
+        Embeddings live in a preallocated matrix, one row per entry, so a lookup is
+        a single matrix-vector product. A stored answer is returned when the cosine
+        similarity reaches `threshold`. Entries expire after `ttl` seconds, the
+        least recently used one is replaced once `max_entries` is reached, and
+        `invalidate_dependency(key)` drops every answer built from that docs cache
+        entry when it is refreshed.
+
+        `embed(text)` is a coroutine returning the embedding vector. Embedding
+        errors are logged and treated as misses; the cache never fails a query.
+    """
+
+    def __init__(self, embed, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, ttl: float = SEMANTIC_CACHE_TTL):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.embed_errors = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+        self._matrix = None
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._code_keys = np.zeros(max_entries, dtype=np.int64)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def text(system_prompt: str, query: str) -> str:
+        question, _ = split_code(query)
+        return f"{system_prompt}\n\n{question}"
+
+    async def vector(self, system_prompt: str, query: str):
+        """Normalized embedding of the query's question, None when the embedding call fails"""
+        start = time.perf_counter()
+        try:
+            vector = np.asarray(await self.embed(self.text(system_prompt, query)), dtype=np.float32)
+        except Exception as e:
+            self.embed_errors += 1
+            logger.warning("embedding failed: %s", e)
+            return None
+        finally:
+            self.lookup_seconds += time.perf_counter() - start
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, code: int = 0):
+        """Returns (entry, similarity) for the best match above the threshold, or (None, best similarity)"""
+        with self._lock:
+            self._expire()
+            candidates = self._active & (self._code_keys == code)
+            if vector is None or self._matrix is None or not candidates.any():
+                self.misses += 1
+                return None, 0.0
+
+            scores = np.where(candidates, self._matrix @ vector, -1.0)
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+
+            entry = self._entries[slot]
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            self.saved_seconds += entry.latency
+            return entry, similarity
+
+    def store(self, vector, answer: str, payload: dict = None,
+              dependencies: set = None, latency: float = 0.0, code: int = 0):
+        if vector is None:
+            return
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+            self._expire()
+            if len(self._entries) >= self.max_entries:
+                slot, _ = self._entries.popitem(last=False)
+            else:
+                slot = int(np.argmin(self._active))
+
+            self._matrix[slot] = vector
+            self._code_keys[slot] = code
+            self._active[slot] = True
+            self._entries[slot] = _Entry(slot, answer, payload or {}, set(dependencies or ()), latency, self.ttl)
+
+    def invalidate_dependency(self, key):
+        with self._lock:
+            for slot in [slot for slot, entry in self._entries.items() if key in entry.dependencies]:
+                self._remove(slot)
+                self.invalidations += 1
+
+    def _expire(self):
+        now = time.monotonic()
+        for slot in [slot for slot, entry in self._entries.items() if entry.expires_at < now]:
+            self._remove(slot)
+
+    def _remove(self, slot: int):
+        del self._entries[slot]
+        self._active[slot] = False
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "embed_errors": self.embed_errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "saved_latency_seconds": round(self.saved_seconds, 3),
+            "embedding_latency_seconds": round(self.lookup_seconds, 3)
+        }
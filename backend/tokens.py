@@ -0,0 +1,41 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # The encoding files are downloaded on first use, estimate when offline
+        return None
+
+def count_tokens(text: str, model: str = "gpt-4.1") -> int:
+    """Counts tokens with tiktoken, or estimates ~4 characters per token without it"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def message_text(message) -> str:
+    content = message.content
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content += "".join(f"{call['name']}{call['args']}" for call in tool_calls)
+    return content
+
+def count_message_tokens(messages: list, model: str = "gpt-4.1") -> int:
+    # ~4 tokens of per-message overhead for role and separators
+    return sum(count_tokens(message_text(message), model) + 4 for message in messages)
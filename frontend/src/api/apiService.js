@@ -32,6 +32,57 @@ class ApiService {
     }
   }
 
+  // POSTs `body` to `endpoint` and calls onEvent(event, data) for every
+  // server-sent event of the response as it arrives
+  async streamEvents(endpoint, body, onEvent) {
+    const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${this.token}`,
+      },
+      body: JSON.stringify(body)
+    });
+
+    if (!response.ok) {
+      throw new Error(`Stream request failed: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const frames = buffer.split('\n\n');
+      buffer = frames.pop();
+
+      for (const frame of frames) {
+        let event = 'message';
+        let data = '';
+        for (const line of frame.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  }
+
+  // Streams /execute-query, onEvent gets libs, tool_start, tool_end, token, done and error
+  async streamExecuteQuery(queryRequest, onEvent) {
+    return this.streamEvents('/execute-query/stream', queryRequest, onEvent);
+  }
+
+  // Streams /api/analyze, onEvent gets a `field` event ({ name, value }) for each
+  // analysis field as soon as the model has finished it, then done or error
+  async streamAnalyzeCode(codeRequest, onEvent) {
+    return this.streamEvents('/api/analyze/stream', codeRequest, onEvent);
+  }
+
   // Code processing
   async processCode(code, language, action, prompt) {
     return this.request('/process-code', {
@@ -100,9 +151,11 @@ class ApiService {
     });
   }
 
-  async getChatsDB(userId = null, limit = 50, offset = 0) {
-    const params = new URLSearchParams({ limit, offset });
+  // Returns { items, next_cursor }; pass next_cursor back as cursor for the next page
+  async getChatsDB(userId = null, limit = 50, cursor = null) {
+    const params = new URLSearchParams({ limit });
     if (userId) params.append('user_id', userId);
+    if (cursor) params.append('cursor', cursor);
     return this.request(`/api/db/chats?${params}`);
   }
 
@@ -129,8 +182,19 @@ class ApiService {
     });
   }
 
-  async getChatMessagesDB(chatId, limit = 100, offset = 0) {
-    return this.request(`/api/db/chats/${chatId}/messages?limit=${limit}&offset=${offset}`);
+  // Returns { items, next_cursor }; pass next_cursor back as cursor for the next page
+  async getChatMessagesDB(chatId, limit = 100, cursor = null) {
+    const params = new URLSearchParams({ limit });
+    if (cursor) params.append('cursor', cursor);
+    return this.request(`/api/db/chats/${chatId}/messages?${params}`);
+  }
+
+  // Imports many messages in one transaction; every chat they reference must exist
+  async bulkCreateMessagesDB(messages) {
+    return this.request('/api/db/messages/bulk', {
+      method: 'POST',
+      body: JSON.stringify(messages)
+    });
   }
 
   // Database Code Projects
@@ -148,11 +212,26 @@ class ApiService {
     });
   }
 
-  async getCodeProjectsDB(language = null, userId = null, limit = 50) {
+  async bulkCreateCodeProjectsDB(projects) {
+    return this.request('/api/db/projects/bulk', {
+      method: 'POST',
+      body: JSON.stringify(projects)
+    });
+  }
+
+  // Full project including code_content; the list and search endpoints return summaries.
+  // The response carries an ETag, so the browser cache revalidates instead of refetching.
+  async getCodeProjectDB(projectId) {
+    return this.request(`/api/db/projects/${projectId}`);
+  }
+
+  // Returns { items, next_cursor }; pass next_cursor back as cursor for the next page
+  async getCodeProjectsDB(language = null, userId = null, limit = 50, cursor = null) {
     const params = new URLSearchParams({ limit });
     if (language) params.append('language', language);
     if (userId) params.append('user_id', userId);
-    
+    if (cursor) params.append('cursor', cursor);
+
     return this.request(`/api/db/projects?${params}`);
   }
 
@@ -182,6 +261,10 @@ class ApiService {
     });
   }
 
+  async getCodeAnalysisDB(analysisId) {
+    return this.request(`/api/db/analysis/${analysisId}`);
+  }
+
   async getProjectAnalysisDB(projectId, analysisType = null) {
     const params = analysisType ? `?analysis_type=${analysisType}` : '';
     return this.request(`/api/db/analysis/project/${projectId}${params}`);
@@ -377,6 +460,8 @@ export const useChatDB = () => {
   const [chats, setChats] = useState([]);
   const [currentChat, setCurrentChat] = useState(null);
   const [messages, setMessages] = useState([]);
+  const [chatsCursor, setChatsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
 
@@ -398,14 +483,16 @@ export const useChatDB = () => {
     }
   };
 
-  const loadChats = async (userId = null, limit = 50, offset = 0) => {
+  // Loads the first page, or appends the next one when `more` is true
+  const loadChats = async (userId = null, limit = 50, more = false) => {
     setIsLoading(true);
     setError(null);
     
     try {
-      const chatList = await apiService.getChatsDB(userId, limit, offset);
-      setChats(chatList);
-      return chatList;
+      const page = await apiService.getChatsDB(userId, limit, more ? chatsCursor : null);
+      setChats(prev => (more ? [...prev, ...page.items] : page.items));
+      setChatsCursor(page.next_cursor);
+      return page.items;
     } catch (err) {
       setError(err.message);
       throw err;
@@ -414,14 +501,16 @@ export const useChatDB = () => {
     }
   };
 
-  const loadChatMessages = async (chatId) => {
+  // Loads the first page, or appends the next one when `more` is true
+  const loadChatMessages = async (chatId, limit = 100, more = false) => {
     setIsLoading(true);
     setError(null);
     
     try {
-      const messageList = await apiService.getChatMessagesDB(chatId);
-      setMessages(messageList);
-      return messageList;
+      const page = await apiService.getChatMessagesDB(chatId, limit, more ? messagesCursor : null);
+      setMessages(prev => (more ? [...prev, ...page.items] : page.items));
+      setMessagesCursor(page.next_cursor);
+      return page.items;
     } catch (err) {
       setError(err.message);
       throw err;
@@ -459,6 +548,8 @@ export const useChatDB = () => {
     chats,
     currentChat,
     messages,
+    hasMoreChats: chatsCursor !== null,
+    hasMoreMessages: messagesCursor !== null,
     isLoading,
     error,
     createChat,
@@ -470,6 +561,13 @@ export const useChatDB = () => {
   };
 };
 
+// List views hold summaries; this turns a full project into one
+const toProjectSummary = ({ code_content, ...project }) => ({
+  ...project,
+  size: code_content.length,
+  preview: code_content.slice(0, 200)
+});
+
 export const useCodeProjectsDB = () => {
   const [projects, setProjects] = useState([]);
   const [currentProject, setCurrentProject] = useState(null);
@@ -482,7 +580,7 @@ export const useCodeProjectsDB = () => {
     
     try {
       const newProject = await apiService.createCodeProjectDB(name, language, codeContent, description, userId);
-      setProjects(prev => [newProject, ...prev]);
+      setProjects(prev => [toProjectSummary(newProject), ...prev]);
       setCurrentProject(newProject);
       return newProject;
     } catch (err) {
@@ -509,13 +607,30 @@ export const useCodeProjectsDB = () => {
     }
   };
 
+  // Fetches the full project (with its code) and makes it the current one
+  const openProject = async (projectId) => {
+    setIsLoading(true);
+    setError(null);
+    
+    try {
+      const project = await apiService.getCodeProjectDB(projectId);
+      setCurrentProject(project);
+      return project;
+    } catch (err) {
+      setError(err.message);
+      throw err;
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   const updateProject = async (projectId, codeContent, name = null) => {
     setIsLoading(true);
     setError(null);
     
     try {
       const updatedProject = await apiService.updateCodeProjectDB(projectId, codeContent, name);
-      setProjects(prev => prev.map(p => p.id === projectId ? updatedProject : p));
+      setProjects(prev => prev.map(p => p.id === projectId ? toProjectSummary(updatedProject) : p));
       if (currentProject && currentProject.id === projectId) {
         setCurrentProject(updatedProject);
       }
@@ -550,6 +665,7 @@ export const useCodeProjectsDB = () => {
     error,
     createProject,
     loadProjects,
+    openProject,
     updateProject,
     searchProjects,
     setCurrentProject
@@ -5,6 +5,7 @@ import ChatMessage from './ChatMessage';
 const ChatPanel = ({ 
   currentChat, 
   isLoading, 
+  streamStatus,
   prompt, 
   setPrompt, 
   handleSubmit, 
@@ -27,7 +28,7 @@ const ChatPanel = ({
         {isLoading && (
           <div className="flex items-center gap-2 text-slate-500 bg-slate-50 rounded-lg p-3">
             <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-blue-500"></div>
-            <span>AI is thinking...</span>
+            <span>{streamStatus || 'AI is thinking...'}</span>
           </div>
         )}
       </div>
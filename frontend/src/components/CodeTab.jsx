@@ -1,12 +1,16 @@
 import React from 'react';
-import { Play, Download } from 'lucide-react';
+import { Play, Download, Sparkles } from 'lucide-react';
 
-const CodeTab = ({ code, setCode }) => {
+const CodeTab = ({ code, setCode, onAnalyze, isAnalyzing, analysisStatus }) => {
   return (
     <div className="h-full flex flex-col">
       <div className="flex items-center justify-between mb-4">
         <h2 className="text-lg font-semibold text-slate-900">Code Editor</h2>
         <div className="flex gap-2">
+          <button className="bg-blue-500 hover:bg-blue-600 disabled:opacity-50 text-white px-4 py-2 rounded-lg flex items-center gap-2" onClick={onAnalyze} disabled={isAnalyzing}>
+            <Sparkles size={16} />
+            {isAnalyzing ? 'Analyzing...' : 'Analyze'}
+          </button>
           <button className="bg-green-500 hover:bg-green-600 text-white px-4 py-2 rounded-lg flex items-center gap-2" onClick={() => alert("Running ...")}>
             <Play size={16} />
             Run
@@ -17,6 +21,9 @@ const CodeTab = ({ code, setCode }) => {
           </button>
         </div>
       </div>
+      {analysisStatus && (
+        <p className="text-sm text-slate-500 mb-2">{analysisStatus}</p>
+      )}
       <textarea
         value={code}
         onChange={(e) => setCode(e.target.value)}
@@ -7,13 +7,17 @@ import ExplanationTab from './ExplanationTab';
 import VisualizationTab from './VisualizationTab';
 import ChatPanel from './ChatPanel';
 
-import axios from 'axios';
+import apiService, { detectLanguage } from '../api/apiService';
 
 export default function CodingAIAgent() {
   const [sidebarCollapsed, setSidebarCollapsed] = useState(false);
   const [activeTab, setActiveTab] = useState('code');
   const [prompt, setPrompt] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [isAnalyzing, setIsAnalyzing] = useState(false);
+  const [analysisStatus, setAnalysisStatus] = useState('');
+  const [streamStatus, setStreamStatus] = useState('');
+  const [chatId, setChatId] = useState(null);
   const [chatHistory] = useState([
     { id: 1, title: 'Debug Python Function', timestamp: '2 hours ago' },
     { id: 2, title: 'Optimize Algorithm', timestamp: '1 day ago' },
@@ -36,9 +40,11 @@ export default function CodingAIAgent() {
     return arr;
 }`);
 
-  const explanation = `This bubble sort implementation has O(n²) time complexity. The algorithm repeatedly steps through the list, compares adjacent elements and swaps them if they are in the wrong order.`;
+  const [explanation, setExplanation] = useState(`This bubble sort implementation has O(n²) time complexity. The algorithm repeatedly steps through the list, compares adjacent elements and swaps them if they are in the wrong order.`);
+  const [suggestions, setSuggestions] = useState(['Add input validation', 'Early termination optimization', 'TypeScript types']);
+  const [warnings, setWarnings] = useState(['O(n²) complexity - consider quicksort for larger datasets.']);
 
-  const visualizationCode = `// Binary Search Tree
+  const [visualizationCode, setVisualizationCode] = useState(`// Binary Search Tree
 class TreeNode {
     constructor(val) {
         this.val = val;
@@ -55,7 +61,7 @@ function insert(root, val) {
         root.right = insert(root.right, val);
     }
     return root;
-}`;
+}`);
 
   const handleSubmit = () => {
     
@@ -67,26 +73,95 @@ function insert(root, val) {
     const query = "code:\n" + code + "\n\n" + "prompt:\n" + prompt
     let query_request = {
       "query": query,
-      "system_prompt": "you are a smart coding assistant"
+      "system_prompt": "you are a smart coding assistant",
+      "chat_id": chatId
     }
 
-    axios.post("http://127.0.0.1:8000/execute-query", query_request)
-      .then(response => {
-        console.log(response)
-        setCode(response.data.result.content)
-      })
-
-    // setTimeout(() => {
-    //   setCurrentChat(prev => [...prev, { 
-    //     message: "I've analyzed your code. Here are some optimization suggestions and explanations.",
-    //     isUser: false 
-    //   }]);
-    //   setIsLoading(false);
-    // }, 1500);
-    setIsLoading(false);
+    // Placeholder AI message that the streamed answer is written into
+    let answer = '';
+    setCurrentChat(prev => [...prev, { message: '', isUser: false }]);
+    const updateAnswer = (text) => setCurrentChat(prev => [
+      ...prev.slice(0, -1),
+      { message: text, isUser: false }
+    ]);
+
+    apiService.streamExecuteQuery(query_request, (event, data) => {
+      switch (event) {
+        case 'libs':
+          setStreamStatus(`Libraries: ${[...Object.keys(data.public), ...Object.keys(data.private)].join(', ') || 'none'}`);
+          break;
+        case 'tool_start':
+          setStreamStatus(`Running ${data.name} (${data.args.lib_name}: ${data.args.topic})`);
+          break;
+        case 'tool_end':
+          setStreamStatus(`${data.name} finished in ${Math.round(data.latency_ms)}ms`);
+          break;
+        case 'token':
+          answer += data.content;
+          updateAnswer(answer);
+          break;
+        case 'done':
+          setChatId(data.chat_id);
+          setCode(data.result);
+          setStreamStatus('');
+          setIsLoading(false);
+          break;
+        case 'error':
+          updateAnswer(`Error: ${data.detail}`);
+          setStreamStatus('');
+          setIsLoading(false);
+          break;
+        default:
+          break;
+      }
+    }).catch(error => {
+      updateAnswer(`Error: ${error.message}`);
+      setStreamStatus('');
+      setIsLoading(false);
+    });
+
     setPrompt('');
   };
 
+  const handleAnalyze = () => {
+    if (!code.trim() || isAnalyzing) return;
+
+    setIsAnalyzing(true);
+    setAnalysisStatus('Analyzing code...');
+
+    const codeRequest = { code, language: detectLanguage(code) };
+    const fieldSetters = {
+      corrected_code: setCode,
+      explanation: setExplanation,
+      suggestions: setSuggestions,
+      warnings: setWarnings,
+      visualization_html: setVisualizationCode
+    };
+
+    apiService.streamAnalyzeCode(codeRequest, (event, data) => {
+      switch (event) {
+        case 'field':
+          // The corrected code arrives first, long before the visualization is written
+          fieldSetters[data.name]?.(data.value);
+          setAnalysisStatus(`Received ${data.name.replace('_', ' ')}`);
+          break;
+        case 'done':
+          setAnalysisStatus(data.complete ? '' : 'Analysis was cut short, some fields are missing');
+          setIsAnalyzing(false);
+          break;
+        case 'error':
+          setAnalysisStatus(`Analysis failed: ${data.detail}`);
+          setIsAnalyzing(false);
+          break;
+        default:
+          break;
+      }
+    }).catch(error => {
+      setAnalysisStatus(`Analysis failed: ${error.message}`);
+      setIsAnalyzing(false);
+    });
+  };
+
   const handleKeyPress = (e) => {
     if (e.key === 'Enter' && !e.shiftKey) {
       e.preventDefault();
@@ -97,9 +172,9 @@ function insert(root, val) {
   const renderTabContent = () => {
     switch (activeTab) {
       case 'code':
-        return <CodeTab code={code} setCode={setCode} />;
+        return <CodeTab code={code} setCode={setCode} onAnalyze={handleAnalyze} isAnalyzing={isAnalyzing} analysisStatus={analysisStatus} />;
       case 'explain':
-        return <ExplanationTab explanation={explanation} />;
+        return <ExplanationTab explanation={explanation} suggestions={suggestions} warnings={warnings} />;
       case 'visualize':
         return <VisualizationTab visualizationCode={visualizationCode} />;
       default:
@@ -133,6 +208,7 @@ function insert(root, val) {
           <ChatPanel 
             currentChat={currentChat}
             isLoading={isLoading}
+            streamStatus={streamStatus}
             prompt={prompt}
             setPrompt={setPrompt}
             handleSubmit={handleSubmit}
@@ -1,15 +1,29 @@
 import json
 import requests
-import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import quote_plus
 
-def get_docs(base_url: str, topic: str, tokens: int = 5_000) -> str:
+# One keep-alive session for every call, retrying 429/5xx with jittered backoff
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.25, backoff_jitter=0.25,
+                      status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"],
+                      raise_on_status=False)
+))
+
+def get_docs(base_url: str, topic: str, tokens: int = 5_000, timeout: tuple = (5, 15)) -> str:
 
     topic = quote_plus(topic)
 
     url = f"{base_url}/llms.txt?topic={topic}&tokens={tokens}"
 
-    response = requests.get(url)
+    try:
+        response = _session.get(url, timeout=timeout)
+    except requests.RequestException as e:
+        return f"Failed to fetch data. Error: {type(e).__name__}"
 
     if response.status_code == 200:
         llms_text_data = response.text